@@ -0,0 +1,143 @@
+"""
+Admission control and load shedding for the inference endpoints.
+
+At most `max_concurrency` requests run at once; up to `max_queue` more wait
+in FIFO order. A request is rejected right away (with Retry-After) when the
+queue is full (429) or when the expected wait, estimated from a moving
+average of service times, would exceed `queue_timeout` (503). Requests that
+still wait longer than `queue_timeout` are rejected with 503 as well.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, List, Optional
+
+from starlette.responses import JSONResponse
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency: int = 2, max_queue: int = 16, queue_timeout: float = 1.0,
+                 initial_service_time: float = 0.01, smoothing: float = 0.2):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.service_time = initial_service_time
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "deadline": 0, "timeout": 0}
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def expected_wait(self, position: int) -> float:
+        return position / self.max_concurrency * self.service_time
+
+    def _reject(self, status_code: int, reason: str, retry_after: float) -> Rejected:
+        self.shed[reason] += 1
+        return Rejected(status_code, reason, retry_after)
+
+    async def acquire(self):
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(429, "queue_full", self.expected_wait(len(self._waiters)))
+        expected = self.expected_wait(len(self._waiters) + 1)
+        if expected > self.queue_timeout:
+            raise self._reject(503, "deadline", expected)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            # release() hands its slot over by resolving the future, in_flight stays unchanged
+            await asyncio.wait_for(fut, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(fut)
+            # On 3.12+ wait_for can time out after release() already handed over the slot
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise self._reject(503, "timeout", self.expected_wait(len(self._waiters) + 1))
+        except asyncio.CancelledError:
+            self._discard(fut)
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+        self.admitted += 1
+
+    def _discard(self, fut: asyncio.Future):
+        try:
+            self._waiters.remove(fut)
+        except ValueError:
+            pass
+
+    def release(self, duration: Optional[float] = None):
+        if duration is not None:
+            self.service_time += self.smoothing * (duration - self.service_time)
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def prometheus_lines(self) -> List[str]:
+        lines = [
+            "# TYPE hello_api_predict_in_flight gauge",
+            f"hello_api_predict_in_flight {self.in_flight}",
+            "# TYPE hello_api_predict_queued gauge",
+            f"hello_api_predict_queued {self.queued}",
+            "# TYPE hello_api_predict_service_seconds gauge",
+            f"hello_api_predict_service_seconds {self.service_time:.6f}",
+            "# TYPE hello_api_predict_admitted_total counter",
+            f"hello_api_predict_admitted_total {self.admitted}",
+            "# TYPE hello_api_predict_shed_total counter",
+        ]
+        lines += [f'hello_api_predict_shed_total{{reason="{reason}"}} {count}' for reason, count in self.shed.items()]
+        return lines
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController to paths under `path_prefix`.
+
+    Runs on the event loop, before requests reach the inference executor,
+    so excess load never piles up there.
+    """
+
+    def __init__(self, app, controller: AdmissionController, path_prefix: str = "/predict"):
+        self.app = app
+        self.controller = controller
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.controller.acquire()
+        except Rejected as exc:
+            response = JSONResponse(
+                {"detail": f"overloaded ({exc.reason})"},
+                status_code=exc.status_code,
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(time.perf_counter() - started)
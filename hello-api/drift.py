@@ -0,0 +1,135 @@
+"""
+Streaming per-feature statistics of scored inputs, for drift detection.
+
+Memory is O(features x bins) regardless of traffic. Incoming rows are
+buffered and folded in vectorized batches: count/mean/M2 are merged with
+Chan's parallel form of Welford's algorithm, histograms use the training
+bin edges from the bundle's `feature_stats` plus underflow/overflow bins.
+"""
+import math
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+# Floor for empty bins so PSI stays finite
+PSI_EPSILON = 1e-4
+
+
+class RunningStats:
+    def __init__(self, n_features: int, bin_edges: Optional[List[List[float]]] = None):
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.min = np.full(n_features, np.inf)
+        self.max = np.full(n_features, -np.inf)
+        self.histogram = None
+        if bin_edges:
+            # Training edges are uniform (np.linspace), so binning is one affine transform
+            edges = np.asarray(bin_edges, dtype=float)
+            self.lo = edges[:, 0]
+            self.hi = edges[:, -1]
+            self.bins = edges.shape[1] - 1
+            self.width = np.where(self.hi > self.lo, (self.hi - self.lo) / self.bins, 1.0)
+            # [underflow, bin_0 .. bin_{n-1}, overflow] per feature
+            self.histogram = np.zeros((n_features, self.bins + 2), dtype=np.int64)
+
+    def update(self, X: np.ndarray):
+        n = X.shape[0]
+        if n == 0:
+            return
+        batch_mean = X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + batch_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+        np.minimum(self.min, X.min(axis=0), out=self.min)
+        np.maximum(self.max, X.max(axis=0), out=self.max)
+
+        if self.histogram is not None:
+            idx = np.floor((X - self.lo) / self.width).astype(np.int64)
+            # np.histogram closes the last bin on the right; keep that so live and training counts line up
+            idx[(X == self.hi) & (idx == self.bins)] = self.bins - 1
+            idx = np.clip(idx, -1, self.bins) + 1
+            n_slots = self.bins + 2
+            flat = idx + np.arange(X.shape[1]) * n_slots
+            self.histogram += np.bincount(flat.ravel(), minlength=self.histogram.size).reshape(self.histogram.shape)
+
+    @property
+    def variance(self) -> np.ndarray:
+        return self.m2 / self.count if self.count else np.zeros_like(self.m2)
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Population stability index between two histograms of the same bins."""
+    e = np.maximum(expected / max(expected.sum(), 1), PSI_EPSILON)
+    a = np.maximum(actual / max(actual.sum(), 1), PSI_EPSILON)
+    return float(((a - e) * np.log(a / e)).sum())
+
+
+class DriftMonitor:
+    def __init__(self, training: Optional[dict], n_features: int, flush_rows: int = 256):
+        self.training = training or {}
+        self.names = self.training.get("feature_names") or [f"feature_{i}" for i in range(n_features)]
+        self.flush_rows = flush_rows
+        self.stats = RunningStats(n_features, self.training.get("bin_edges"))
+        self._pending: List[np.ndarray] = []
+        self._pending_rows = 0
+        self._lock = threading.Lock()
+
+    def observe(self, rows):
+        X = np.asarray(rows, dtype=float)
+        with self._lock:
+            self._pending.append(X)
+            self._pending_rows += X.shape[0]
+            if self._pending_rows >= self.flush_rows:
+                self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self.stats.update(np.concatenate(self._pending))
+            self._pending.clear()
+            self._pending_rows = 0
+
+    def report(self) -> dict:
+        with self._lock:
+            self._flush()
+            s = self.stats
+            features = []
+            for j, name in enumerate(self.names):
+                live = {
+                    "mean": float(s.mean[j]),
+                    "std": math.sqrt(float(s.variance[j])),
+                    "min": float(s.min[j]) if s.count else None,
+                    "max": float(s.max[j]) if s.count else None,
+                }
+                entry = {"name": name, "live": live}
+                if self.training:
+                    train_std = math.sqrt(self.training["variance"][j])
+                    entry["training"] = {
+                        "mean": self.training["mean"][j],
+                        "std": train_std,
+                        "min": self.training["min"][j],
+                        "max": self.training["max"][j],
+                    }
+                    if s.count:
+                        entry["mean_shift"] = (live["mean"] - self.training["mean"][j]) / (train_std or 1.0)
+                if s.histogram is not None:
+                    live["histogram"] = s.histogram[j].tolist()
+                    if s.count:
+                        expected = np.concatenate([[0], self.training["histogram"][j], [0]])
+                        entry["psi"] = psi(expected.astype(float), s.histogram[j].astype(float))
+                features.append(entry)
+            return {"count": s.count, "training_count": self.training.get("count"), "features": features}
+
+    def prometheus_lines(self) -> List[str]:
+        report = self.report()
+        lines = ["# TYPE hello_api_drift_rows_total counter", f"hello_api_drift_rows_total {report['count']}"]
+        for key, metric in (("mean_shift", "hello_api_drift_mean_shift"), ("psi", "hello_api_drift_psi")):
+            values = [(f["name"], f[key]) for f in report["features"] if key in f]
+            if values:
+                lines.append(f"# TYPE {metric} gauge")
+                lines += [f'{metric}{{feature="{name}"}} {value:.6f}' for name, value in values]
+        return lines
@@ -0,0 +1,155 @@
+"""
+Dedicated executor for inference.
+
+Keeps model work off Starlette's shared anyio threadpool: "thread" mode is a
+sized thread pool (NumPy/BLAS release the GIL), "process" mode a spawn-based
+process pool whose workers load their own copy of the model.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, List, Optional, Tuple
+
+# How long a warm-up task waits for the other workers before giving up on the barrier
+WARM_TIMEOUT_SEC = 120.0
+
+# Set in each process-pool worker by _init_process
+_WARM_BARRIER: Optional[Any] = None
+
+
+def timed(fn: Callable, *args) -> Tuple[Any, float]:
+    """Run fn and return (result, seconds) measured inside the worker, excluding queue wait."""
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def _init_process(barrier, initializer: Optional[Callable], initargs: tuple):
+    global _WARM_BARRIER
+    _WARM_BARRIER = barrier
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _warm_task(fn: Callable, args: tuple) -> int:
+    fn(*args)
+    if _WARM_BARRIER is not None:
+        # Hold this worker until every worker has a task, so no single worker takes two
+        try:
+            _WARM_BARRIER.wait(WARM_TIMEOUT_SEC)
+        except threading.BrokenBarrierError:
+            pass
+    return os.getpid()
+
+
+class InferenceExecutor:
+    def __init__(self, kind: str = "thread", workers: int = 2, initializer: Callable = None, initargs: tuple = ()):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"unknown executor kind {kind!r}")
+        self.kind = kind
+        self.workers = workers
+        self._initializer = initializer
+        self._initargs = initargs
+        self._pool: Executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def pool(self) -> Executor:
+        # Created on first use so importing the app never spawns processes
+        with self._lock:
+            if self._pool is None:
+                if self.kind == "process":
+                    ctx = multiprocessing.get_context("spawn")
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=ctx,
+                        initializer=_init_process,
+                        initargs=(ctx.Barrier(self.workers), self._initializer, self._initargs),
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+            return self._pool
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.workers)
+
+    @property
+    def saturation(self) -> float:
+        return min(self.in_flight, self.workers) / self.workers
+
+    def _started(self):
+        with self._lock:
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def _finished(self, started: float, ok: bool):
+        with self._lock:
+            self.in_flight -= 1
+            self.busy_seconds += time.perf_counter() - started
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    async def run(self, fn: Callable, *args) -> Any:
+        started = self._started()
+        ok = False
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+            ok = True
+            return result
+        finally:
+            self._finished(started, ok)
+
+    def run_sync(self, fn: Callable, *args) -> Any:
+        started = self._started()
+        ok = False
+        try:
+            result = self.pool.submit(fn, *args).result()
+            ok = True
+            return result
+        finally:
+            self._finished(started, ok)
+
+    def warm(self, fn: Callable, *args) -> List[int]:
+        """Run fn once on every worker at the same time; returns the worker PIDs.
+
+        The process pool only spawns a worker when none is idle, so sequential
+        calls would keep reusing the first one. Submitting `workers` tasks at
+        once, each held at a barrier until all have started, makes the pool
+        spawn, initialise and warm every worker before this returns.
+        """
+        futures = [self.pool.submit(_warm_task, fn, args) for _ in range(self.workers)]
+        wait(futures)
+        return [f.result() for f in futures]
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def prometheus_lines(self) -> List[str]:
+        return [
+            "# TYPE hello_api_inference_workers gauge",
+            f'hello_api_inference_workers{{kind="{self.kind}"}} {self.workers}',
+            "# TYPE hello_api_inference_in_flight gauge",
+            f"hello_api_inference_in_flight {self.in_flight}",
+            "# TYPE hello_api_inference_queue_depth gauge",
+            f"hello_api_inference_queue_depth {self.queue_depth}",
+            "# TYPE hello_api_inference_saturation gauge",
+            f"hello_api_inference_saturation {self.saturation:.3f}",
+            "# TYPE hello_api_inference_tasks_total counter",
+            f'hello_api_inference_tasks_total{{outcome="ok"}} {self.completed}',
+            f'hello_api_inference_tasks_total{{outcome="error"}} {self.failed}',
+            "# TYPE hello_api_inference_busy_seconds_total counter",
+            f"hello_api_inference_busy_seconds_total {self.busy_seconds:.6f}",
+        ]
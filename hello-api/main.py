@@ -1,38 +1,169 @@
 import os
-from typing import List
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
 import joblib
+import numpy as np
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-
-app = FastAPI(title="IDP Demo Hello API")
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+
+from admission import AdmissionController, AdmissionMiddleware
+from drift import DriftMonitor
+from executor import InferenceExecutor, timed
+from model_store import fetch_model_from_env
+from predictor import Predictor, init_worker, worker_predict
+from shadow import ShadowComparator
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up off the event loop so /healthz answers while /readyz is still 503
+    threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+    if SHADOW is not None:
+        SHADOW.start()
+    yield
+    if SHADOW is not None:
+        SHADOW.stop()
+    EXECUTOR.shutdown()
+
+
+app = FastAPI(title="IDP Demo Hello API", lifespan=lifespan)
+
+# Bounded concurrency + queue for /predict; the pod only has 250m CPU
+ADMISSION = AdmissionController(
+    max_concurrency=int(os.getenv("PREDICT_MAX_CONCURRENCY", "2")),
+    max_queue=int(os.getenv("PREDICT_MAX_QUEUE", "16")),
+    queue_timeout=float(os.getenv("PREDICT_QUEUE_TIMEOUT", "1.0")),
+)
+app.add_middleware(AdmissionMiddleware, controller=ADMISSION)
 
 VERSION = os.getenv("VERSION", "dev")
 MODEL_PATH = os.getenv("MODEL_PATH", "model/model.joblib")
 MODEL_SHA = os.getenv("MODEL_SHA", "dev")
+# When set together with MODEL_S3_ENDPOINT the bundle is fetched from MinIO into MODEL_CACHE_DIR
+MODEL_OBJECT = os.getenv("MODEL_OBJECT", "")
+WARMUP_ITERATIONS = int(os.getenv("WARMUP_ITERATIONS", "20"))
+WARMUP_BATCH_SIZE = int(os.getenv("WARMUP_BATCH_SIZE", "32"))
+MAX_BATCH_SIZE = int(os.getenv("PREDICT_MAX_BATCH_SIZE", "1024"))
+# "thread" suits GIL-releasing NumPy/sklearn models, "process" gives each worker its own model copy
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+# Optional candidate model scored on a sample of /predict traffic, off the request path
+SHADOW_MODEL_OBJECT = os.getenv("SHADOW_MODEL_OBJECT", "")
+SHADOW_MODEL_SHA = os.getenv("SHADOW_MODEL_SHA", "")
+SHADOW_MODEL_PATH = os.getenv("SHADOW_MODEL_PATH", "")
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.1"))
+SHADOW_MAX_QUEUE = int(os.getenv("SHADOW_MAX_QUEUE", "64"))
+SHADOW_CPU_BUDGET = float(os.getenv("SHADOW_CPU_BUDGET", "0.1"))
+# A missing candidate must not stall startup for the primary's MODEL_FETCH_RETRIES backoff
+SHADOW_FETCH_RETRIES = int(os.getenv("SHADOW_FETCH_RETRIES", "1"))
+DRIFT_FLUSH_ROWS = int(os.getenv("DRIFT_FLUSH_ROWS", "256"))
+
+READY = threading.Event()
 
 
 class PredictRequest(BaseModel):
     features: List[float]
+    top_k: Optional[int] = Field(default=None, ge=1)
+    return_proba: bool = False
+
+
+class BatchPredictRequest(BaseModel):
+    instances: List[List[float]]
+    top_k: Optional[int] = Field(default=None, ge=1)
+    return_proba: bool = False
+
 
+def resolve_model_path() -> str:
+    # Fetch errors propagate: without the model the pod should restart, as the old initContainer retried
+    return fetch_model_from_env(MODEL_OBJECT, MODEL_SHA) or MODEL_PATH
 
-def load_model():
+
+def load_model(model_path: str):
     try:
-        bundle = joblib.load(MODEL_PATH)
+        bundle = joblib.load(model_path)
         model = bundle.get("model")
         target_names = bundle.get("target_names") or ["class_0", "class_1", "class_2"]
         if model is None:
             raise ValueError("model not found in bundle")
-        return model, target_names
+        # Bundles from older train.py runs have no feature_stats; drift then reports live stats only
+        return model, target_names, bundle.get("feature_stats")
     except FileNotFoundError:
-        return None, None
+        return None, None, None
     except Exception as exc:
         # fallback to no-model mode
-        print(f"[warn] failed to load model {MODEL_PATH}: {exc}")
-        return None, None
+        print(f"[warn] failed to load model {model_path}: {exc}")
+        return None, None, None
+
+
+MODEL_FILE = resolve_model_path()
+MODEL, TARGET_NAMES, FEATURE_STATS = load_model(MODEL_FILE)
+PREDICTOR = Predictor(MODEL, TARGET_NAMES) if MODEL is not None else None
+DRIFT = DriftMonitor(FEATURE_STATS, n_features=4, flush_rows=DRIFT_FLUSH_ROWS) if MODEL is not None else None
+
+EXECUTOR = InferenceExecutor(
+    kind=INFERENCE_EXECUTOR,
+    workers=INFERENCE_WORKERS,
+    initializer=init_worker if INFERENCE_EXECUTOR == "process" else None,
+    initargs=(MODEL_FILE,),
+)
+
+
+def load_shadow() -> Optional[ShadowComparator]:
+    try:
+        # Same MinIO cache as the primary; unlike the primary a broken candidate must not take the pod down
+        path = fetch_model_from_env(SHADOW_MODEL_OBJECT, SHADOW_MODEL_SHA, retries=SHADOW_FETCH_RETRIES) or SHADOW_MODEL_PATH
+    except Exception as exc:
+        print(f"[warn] failed to fetch shadow model {SHADOW_MODEL_OBJECT}: {exc}")
+        return None
+    if not path:
+        return None
+    model, target_names, _ = load_model(path)
+    if model is None:
+        print(f"[warn] shadow model {path} not loaded, mirroring disabled")
+        return None
+    return ShadowComparator(
+        Predictor(model, target_names),
+        model_sha=SHADOW_MODEL_SHA or path,
+        sample_rate=SHADOW_SAMPLE_RATE,
+        max_queue=SHADOW_MAX_QUEUE,
+        cpu_budget=SHADOW_CPU_BUDGET,
+    )
+
+
+SHADOW = load_shadow() if PREDICTOR is not None else None
+
+
+def _infer_fn():
+    return worker_predict if EXECUTOR.kind == "process" else PREDICTOR.predict
 
 
-MODEL, TARGET_NAMES = load_model()
+async def infer(rows, top_k: Optional[int] = None, return_proba: bool = False) -> List[dict]:
+    results, seconds = await EXECUTOR.run(timed, _infer_fn(), rows, top_k, return_proba)
+    DRIFT.observe(rows)
+    if SHADOW is not None:
+        SHADOW.offer(rows, results, seconds)
+    return results
+
+
+def warm_up():
+    """Run synthetic predictions so the first real request doesn't pay sklearn/BLAS lazy init."""
+    if MODEL is None:
+        print("[warmup] no model loaded, staying unready")
+        return
+    started = time.perf_counter()
+    rows = np.random.default_rng(0).uniform(0.0, 8.0, size=(max(1, WARMUP_BATCH_SIZE), 4))
+    fn = _infer_fn()
+    # warm() runs on every pool worker at once; in process mode each loads and warms its own model
+    for _ in range(WARMUP_ITERATIONS):
+        EXECUTOR.warm(fn, rows[:1].tolist(), None, False)
+        EXECUTOR.warm(fn, rows.tolist(), None, False)
+        EXECUTOR.warm(fn, rows.tolist(), 2, True)
+    print(f"[warmup] {WARMUP_ITERATIONS} iterations in {time.perf_counter() - started:.3f}s")
+    READY.set()
 
 
 @app.get("/")
@@ -45,18 +176,57 @@ def healthz():
     return {"status": "ok"}
 
 
+@app.get("/readyz")
+def readyz():
+    if not READY.is_set():
+        return JSONResponse({"status": "warming up"}, status_code=503)
+    return {"status": "ready"}
+
+
 @app.get("/version")
 def version():
     return {"version": VERSION, "model_sha": MODEL_SHA}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    lines = ADMISSION.prometheus_lines() + EXECUTOR.prometheus_lines()
+    if SHADOW is not None:
+        lines += SHADOW.prometheus_lines()
+    if DRIFT is not None:
+        lines += DRIFT.prometheus_lines()
+    return "\n".join(lines) + "\n"
+
+
+@app.get("/shadow")
+def shadow():
+    if SHADOW is None:
+        return {"enabled": False}
+    return {"enabled": True, **SHADOW.stats()}
+
+
+@app.get("/drift")
+def drift():
+    if DRIFT is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    return DRIFT.report()
+
+
 @app.post("/predict")
-def predict(req: PredictRequest):
+async def predict(req: PredictRequest):
     if MODEL is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
     if len(req.features) != 4:
         raise HTTPException(status_code=400, detail="features must contain 4 values")
-    preds = MODEL.predict([req.features])
-    idx = int(preds[0])
-    label = TARGET_NAMES[idx] if TARGET_NAMES and idx < len(TARGET_NAMES) else str(idx)
-    return {"class_id": idx, "class_name": label}
+    return (await infer([req.features], top_k=req.top_k, return_proba=req.return_proba))[0]
+
+
+@app.post("/predict/batch")
+async def predict_batch(req: BatchPredictRequest):
+    if MODEL is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if not req.instances or len(req.instances) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"instances must contain 1..{MAX_BATCH_SIZE} rows")
+    if any(len(row) != 4 for row in req.instances):
+        raise HTTPException(status_code=400, detail="each instance must contain 4 values")
+    return {"predictions": await infer(req.instances, top_k=req.top_k, return_proba=req.return_proba)}
@@ -0,0 +1,231 @@
+"""
+Fetch the model bundle from MinIO (or any S3-compatible endpoint) into a
+content-addressed local cache.
+
+Files are stored as <cache>/<sha256>.joblib and only moved into place after
+their hash was verified, so a restart (or reload) with an already seen
+MODEL_SHA never touches the network.
+"""
+import hashlib
+import hmac
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+from urllib.parse import quote, urlparse
+
+import httpx
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+class ModelFetchError(Exception):
+    pass
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class S3Client:
+    """Minimal SigV4-signed GET/HEAD client sharing one pooled HTTP connection set."""
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str, region: str = "us-east-1",
+                 max_connections: int = 8, timeout: float = 30.0, transport: Optional[httpx.BaseTransport] = None):
+        self.endpoint = endpoint.rstrip("/")
+        self.host = urlparse(self.endpoint).netloc
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.client = httpx.Client(
+            base_url=self.endpoint,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+
+    def close(self):
+        self.client.close()
+
+    def _signed_headers(self, method: str, path: str) -> dict:
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = amz_date[:8]
+        headers = {"host": self.host, "x-amz-content-sha256": EMPTY_SHA256, "x-amz-date": amz_date}
+        signed = ";".join(sorted(headers))
+        canonical = "\n".join([
+            method, path, "",
+            *(f"{name}:{headers[name]}" for name in sorted(headers)), "",
+            signed, EMPTY_SHA256,
+        ])
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical.encode("utf-8")).hexdigest()])
+        key = _hmac(("AWS4" + self.secret_key).encode("utf-8"), date)
+        for part in (self.region, "s3", "aws4_request"):
+            key = _hmac(key, part)
+        signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, SignedHeaders={signed}, Signature={signature}"
+        )
+        return headers
+
+    def _request(self, method: str, bucket: str, key: str, byte_range: Optional[Tuple[int, int]] = None) -> httpx.Response:
+        path = "/" + quote(f"{bucket}/{key}", safe="/~")
+        headers = self._signed_headers(method, path)
+        if byte_range is not None:
+            headers["range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+        resp = self.client.request(method, path, headers=headers)
+        if resp.status_code >= 400:
+            raise ModelFetchError(f"{method} {bucket}/{key} -> {resp.status_code}")
+        return resp
+
+    def size(self, bucket: str, key: str) -> int:
+        return int(self._request("HEAD", bucket, key).headers["content-length"])
+
+    def download(self, bucket: str, key: str, dest: str, part_size: int = 8 * 1024 * 1024, workers: int = 4):
+        """Download to `dest`, splitting objects larger than `part_size` into parallel ranged GETs."""
+        size = self.size(bucket, key)
+        ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)] or [(0, -1)]
+
+        with open(dest, "wb") as f:
+            f.truncate(size)
+
+        def fetch(byte_range: Tuple[int, int]):
+            if byte_range[1] < byte_range[0]:
+                return
+            data = self._request("GET", bucket, key, byte_range if len(ranges) > 1 else None).content
+            if len(data) != byte_range[1] - byte_range[0] + 1:
+                raise ModelFetchError(f"Short read for {bucket}/{key} range {byte_range}")
+            with open(dest, "r+b") as f:
+                f.seek(byte_range[0])
+                f.write(data)
+
+        if len(ranges) == 1:
+            fetch(ranges[0])
+            return
+        with ThreadPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            list(pool.map(fetch, ranges))
+
+
+class ModelCache:
+    """Content-addressed store: <root>/<sha256>.joblib plus object-name aliases."""
+
+    def __init__(self, root: str, keep: int = 3):
+        self.root = root
+        self.keep = keep
+        os.makedirs(os.path.join(root, "aliases"), exist_ok=True)
+
+    def path_for(self, sha: str) -> str:
+        return os.path.join(self.root, f"{sha}.joblib")
+
+    def _alias_path(self, object_name: str) -> str:
+        return os.path.join(self.root, "aliases", hashlib.sha256(object_name.encode("utf-8")).hexdigest())
+
+    def lookup(self, object_name: str, expected_sha: Optional[str]) -> Optional[str]:
+        sha = expected_sha
+        if not sha:
+            # No trustworthy SHA (e.g. the "seed" configmap): fall back to what this object resolved to before
+            try:
+                with open(self._alias_path(object_name), "r", encoding="utf-8") as f:
+                    sha = f.read().strip()
+            except FileNotFoundError:
+                return None
+        path = self.path_for(sha)
+        if os.path.isfile(path):
+            os.utime(path)
+            return path
+        return None
+
+    def put(self, tmp_path: str, sha: str, object_name: str) -> str:
+        path = self.path_for(sha)
+        os.replace(tmp_path, path)
+        with open(self._alias_path(object_name), "w", encoding="utf-8") as f:
+            f.write(sha)
+        self.prune()
+        return path
+
+    def prune(self):
+        entries = sorted(
+            (os.path.join(self.root, name) for name in os.listdir(self.root) if name.endswith(".joblib")),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        for stale in entries[self.keep:]:
+            os.remove(stale)
+
+
+def fetch_model(client: S3Client, cache: ModelCache, object_name: str, expected_sha: Optional[str] = None,
+                retries: int = 30, backoff: float = 2.0, workers: int = 4, part_size: int = 8 * 1024 * 1024) -> str:
+    """Return a local path for `object_name` ("bucket/key"), downloading it only on a cache miss."""
+    if expected_sha and not SHA256_RE.match(expected_sha):
+        expected_sha = None
+    cached = cache.lookup(object_name, expected_sha)
+    if cached:
+        print(f"[model] cache hit for {object_name} ({os.path.basename(cached)[:12]})")
+        return cached
+
+    bucket, _, key = object_name.partition("/")
+    if not key:
+        raise ModelFetchError(f"MODEL_OBJECT must look like bucket/key, got {object_name!r}")
+
+    last_err: Optional[Exception] = None
+    for attempt in range(1, retries + 1):
+        fd, tmp_path = tempfile.mkstemp(dir=cache.root, suffix=".part")
+        os.close(fd)
+        try:
+            started = time.time()
+            client.download(bucket, key, tmp_path, part_size=part_size, workers=workers)
+            sha = file_sha256(tmp_path)
+            if expected_sha and sha != expected_sha:
+                raise ModelFetchError(f"SHA mismatch for {object_name}: expected {expected_sha}, got {sha}")
+            print(f"[model] fetched {object_name} in {time.time() - started:.2f}s (sha={sha[:12]})")
+            return cache.put(tmp_path, sha, object_name)
+        except (ModelFetchError, httpx.HTTPError, OSError) as exc:
+            last_err = exc
+            print(f"[model] fetch attempt {attempt}/{retries} failed: {exc}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        if attempt < retries:
+            time.sleep(backoff)
+    raise ModelFetchError(f"Could not fetch {object_name}: {last_err}")
+
+
+def fetch_model_from_env(object_name: str, expected_sha: Optional[str], retries: Optional[int] = None) -> Optional[str]:
+    """Fetch using MODEL_S3_ENDPOINT / MINIO_* settings; None when no endpoint is configured.
+
+    `retries` overrides MODEL_FETCH_RETRIES (the primary waits for MinIO, an optional model should not).
+    """
+    endpoint = os.getenv("MODEL_S3_ENDPOINT", os.getenv("MINIO_ENDPOINT", ""))
+    if not object_name or not endpoint:
+        return None
+    client = S3Client(
+        endpoint,
+        os.getenv("MINIO_ROOT_USER", os.getenv("AWS_ACCESS_KEY_ID", "")),
+        os.getenv("MINIO_ROOT_PASSWORD", os.getenv("AWS_SECRET_ACCESS_KEY", "")),
+        region=os.getenv("MODEL_S3_REGION", "us-east-1"),
+    )
+    try:
+        return fetch_model(
+            client,
+            ModelCache(os.getenv("MODEL_CACHE_DIR", "/tmp/model-cache"), keep=int(os.getenv("MODEL_CACHE_KEEP", "3"))),
+            object_name,
+            expected_sha,
+            retries=retries if retries is not None else int(os.getenv("MODEL_FETCH_RETRIES", "30")),
+            workers=int(os.getenv("MODEL_DOWNLOAD_WORKERS", "4")),
+            part_size=int(os.getenv("MODEL_PART_SIZE", str(8 * 1024 * 1024))),
+        )
+    finally:
+        client.close()
@@ -0,0 +1,88 @@
+"""
+Vectorized prediction and post-processing for a loaded model bundle.
+
+Class ids and names are resolved once into arrays indexed by the model's
+probability columns, so a batch is labelled with one fancy-index lookup
+instead of per-row Python indexing.
+"""
+from typing import List, Optional, Sequence
+
+import joblib
+import numpy as np
+
+
+def softmax(scores: np.ndarray) -> np.ndarray:
+    shifted = scores - scores.max(axis=1, keepdims=True)
+    np.exp(shifted, out=shifted)
+    shifted /= shifted.sum(axis=1, keepdims=True)
+    return shifted
+
+
+class Predictor:
+    def __init__(self, model, target_names: Optional[Sequence[str]] = None):
+        self.model = model
+        classes = np.asarray(getattr(model, "classes_", np.arange(len(target_names or []))))
+        self.class_ids = classes.astype(int)
+        names = list(target_names or [])
+        self.class_names = np.array(
+            [str(names[c]) if 0 <= c < len(names) else str(c) for c in self.class_ids.tolist()],
+            dtype=object,
+        )
+        self.n_features = getattr(model, "n_features_in_", None)
+
+    def probabilities(self, X: np.ndarray) -> np.ndarray:
+        if hasattr(self.model, "predict_proba"):
+            return self.model.predict_proba(X)
+        scores = np.asarray(self.model.decision_function(X), dtype=float)
+        if scores.ndim == 1:
+            # Binary classifiers return one margin per row
+            scores = np.column_stack([-scores, scores])
+        return softmax(scores)
+
+    def predict(self, rows, top_k: Optional[int] = None, return_proba: bool = False) -> List[dict]:
+        X = np.asarray(rows, dtype=float)
+        if not top_k and not return_proba:
+            # Fast path: plain argmax labels, no probability matrix
+            columns = np.searchsorted(self.class_ids, np.asarray(self.model.predict(X)).astype(int))
+            ids = self.class_ids[columns].tolist()
+            names = self.class_names[columns].tolist()
+            return [{"class_id": i, "class_name": n} for i, n in zip(ids, names)]
+
+        proba = self.probabilities(X)
+        best = proba.argmax(axis=1)
+        results = [
+            {"class_id": i, "class_name": n}
+            for i, n in zip(self.class_ids[best].tolist(), self.class_names[best].tolist())
+        ]
+
+        if return_proba:
+            names = self.class_names.tolist()
+            for result, row in zip(results, proba.tolist()):
+                result["probabilities"] = dict(zip(names, row))
+
+        if top_k:
+            k = min(top_k, proba.shape[1])
+            top = np.argpartition(-proba, k - 1, axis=1)[:, :k]
+            top_p = np.take_along_axis(proba, top, axis=1)
+            order = np.argsort(-top_p, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_p = np.take_along_axis(top_p, order, axis=1)
+            for result, ids, names, probs in zip(results, self.class_ids[top].tolist(), self.class_names[top].tolist(), top_p.tolist()):
+                result["top_k"] = [
+                    {"class_id": i, "class_name": n, "probability": p} for i, n, p in zip(ids, names, probs)
+                ]
+        return results
+
+
+# Per-process predictor for INFERENCE_EXECUTOR=process; set by init_worker in each pool worker
+_WORKER_PREDICTOR: Optional[Predictor] = None
+
+
+def init_worker(model_path: str):
+    global _WORKER_PREDICTOR
+    bundle = joblib.load(model_path)
+    _WORKER_PREDICTOR = Predictor(bundle["model"], bundle.get("target_names") or ["class_0", "class_1", "class_2"])
+
+
+def worker_predict(rows, top_k: Optional[int] = None, return_proba: bool = False) -> List[dict]:
+    return _WORKER_PREDICTOR.predict(rows, top_k=top_k, return_proba=return_proba)
@@ -0,0 +1,123 @@
+"""
+Shadow scoring of a candidate model on mirrored /predict traffic.
+
+The request path only samples and enqueues (non-blocking, dropped when the
+bounded queue is full); one background thread scores the candidate and
+records agreement with the primary and latency deltas. After each batch the
+worker sleeps long enough to keep its duty cycle under `cpu_budget`.
+"""
+import queue
+import random
+import threading
+import time
+from typing import List, Optional
+
+
+class ShadowComparator:
+    def __init__(self, predictor, model_sha: str = "", sample_rate: float = 0.1, max_queue: int = 64,
+                 cpu_budget: float = 0.1, seed: Optional[int] = None):
+        self.predictor = predictor
+        self.model_sha = model_sha
+        self.sample_rate = sample_rate
+        self.cpu_budget = cpu_budget
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._random = random.Random(seed)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.sampled = 0
+        self.dropped = 0
+        self.errors = 0
+        self.batches = 0
+        self.compared = 0
+        self.agreed = 0
+        self.primary_seconds = 0.0
+        self.shadow_seconds = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="shadow", daemon=True)
+            self._thread.start()
+
+    def stop(self, drain: bool = False, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        if drain:
+            deadline = time.monotonic() + timeout
+            while self._queue.unfinished_tasks and time.monotonic() < deadline:
+                time.sleep(0.005)
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def offer(self, rows, primary: List[dict], primary_seconds: float):
+        """Called on the request path; never blocks."""
+        if self.sample_rate <= 0 or self._random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((rows, [r["class_id"] for r in primary], primary_seconds))
+            self.sampled += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                rows, primary_ids, primary_seconds = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            started = time.perf_counter()
+            try:
+                shadow = self.predictor.predict(rows)
+            except Exception as exc:
+                with self._lock:
+                    self.errors += 1
+                print(f"[shadow] prediction failed: {exc}")
+                shadow = None
+            elapsed = time.perf_counter() - started
+            if shadow is not None:
+                with self._lock:
+                    self.batches += 1
+                    self.compared += len(primary_ids)
+                    self.agreed += sum(p == s["class_id"] for p, s in zip(primary_ids, shadow))
+                    self.primary_seconds += primary_seconds
+                    self.shadow_seconds += elapsed
+            self._queue.task_done()
+            if 0 < self.cpu_budget < 1:
+                # busy / (busy + idle) <= cpu_budget
+                self._stop.wait(elapsed * (1 - self.cpu_budget) / self.cpu_budget)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "model_sha": self.model_sha,
+                "sample_rate": self.sample_rate,
+                "sampled": self.sampled,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "queued": self._queue.qsize(),
+                "compared": self.compared,
+                "agreement": self.agreed / self.compared if self.compared else None,
+                "mean_latency_delta_seconds": (
+                    (self.shadow_seconds - self.primary_seconds) / self.batches if self.batches else None
+                ),
+            }
+
+    def prometheus_lines(self) -> List[str]:
+        with self._lock:
+            return [
+                "# TYPE hello_api_shadow_requests_total counter",
+                f'hello_api_shadow_requests_total{{outcome="sampled"}} {self.sampled}',
+                f'hello_api_shadow_requests_total{{outcome="dropped"}} {self.dropped}',
+                f'hello_api_shadow_requests_total{{outcome="error"}} {self.errors}',
+                "# TYPE hello_api_shadow_queued gauge",
+                f"hello_api_shadow_queued {self._queue.qsize()}",
+                "# TYPE hello_api_shadow_rows_compared_total counter",
+                f"hello_api_shadow_rows_compared_total {self.compared}",
+                "# TYPE hello_api_shadow_rows_agreed_total counter",
+                f"hello_api_shadow_rows_agreed_total {self.agreed}",
+                "# TYPE hello_api_shadow_seconds_total counter",
+                f'hello_api_shadow_seconds_total{{model="primary"}} {self.primary_seconds:.6f}',
+                f'hello_api_shadow_seconds_total{{model="shadow"}} {self.shadow_seconds:.6f}',
+            ]
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, Rejected
+
+
+def test_queue_full_is_rejected_with_429():
+    async def scenario():
+        ctl = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=5.0)
+        await ctl.acquire()
+        waiter = asyncio.ensure_future(ctl.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as exc:
+            await ctl.acquire()
+        assert exc.value.status_code == 429
+        assert exc.value.retry_after >= 1
+
+        ctl.release(0.01)
+        await waiter
+        assert ctl.in_flight == 1
+        ctl.release(0.01)
+        assert ctl.in_flight == 0
+        assert ctl.shed["queue_full"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_timeout_after_handover_returns_the_slot(monkeypatch):
+    async def late_timeout(fut, timeout):
+        # The slot is handed over, then the timeout fires anyway (wait_for on Python 3.12+)
+        ctl.release()
+        assert fut.done()
+        raise asyncio.TimeoutError
+
+    async def scenario():
+        await ctl.acquire()
+        monkeypatch.setattr(asyncio, "wait_for", late_timeout)
+        with pytest.raises(Rejected) as exc:
+            await ctl.acquire()
+        assert exc.value.reason == "timeout"
+        assert ctl.in_flight == 0 and ctl.queued == 0
+
+    ctl = AdmissionController(max_concurrency=1, max_queue=10, queue_timeout=5.0, initial_service_time=0.001)
+    asyncio.run(scenario())
+
+
+def test_expected_wait_over_deadline_is_shed_immediately():
+    async def scenario():
+        ctl = AdmissionController(max_concurrency=1, max_queue=10, queue_timeout=0.5, initial_service_time=2.0)
+        await ctl.acquire()
+        with pytest.raises(Rejected) as exc:
+            await ctl.acquire()
+        assert exc.value.status_code == 503
+        assert exc.value.retry_after == 2
+        assert ctl.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_frees_the_waiter():
+    async def scenario():
+        ctl = AdmissionController(max_concurrency=1, max_queue=10, queue_timeout=0.05, initial_service_time=0.001)
+        await ctl.acquire()
+        with pytest.raises(Rejected) as exc:
+            await ctl.acquire()
+        assert exc.value.reason == "timeout"
+        assert ctl.queued == 0
+        ctl.release()
+        assert ctl.in_flight == 0
+
+    asyncio.run(scenario())
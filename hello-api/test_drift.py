@@ -0,0 +1,61 @@
+import importlib.util
+import pathlib
+
+import numpy as np
+
+from drift import DriftMonitor, RunningStats
+
+
+def load_train_module():
+    # The trainer's own feature_stats, so a format change in ml/train.py breaks this test
+    path = pathlib.Path(__file__).resolve().parent.parent / "ml" / "train.py"
+    spec = importlib.util.spec_from_file_location("ml_train", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def training_stats(X, bins=10):
+    return load_train_module().feature_stats(X, [f"f{i}" for i in range(X.shape[1])], bins=bins)
+
+
+def test_batched_updates_match_numpy():
+    rng = np.random.default_rng(1)
+    X = rng.normal(5.0, 2.0, size=(1000, 3))
+    edges = [np.linspace(0, 10, 11).tolist()] * 3
+    stats = RunningStats(3, edges)
+    for chunk in np.array_split(X, [1, 7, 300, 301, 999]):
+        stats.update(chunk)
+
+    assert stats.count == 1000
+    np.testing.assert_allclose(stats.mean, X.mean(axis=0))
+    np.testing.assert_allclose(stats.variance, X.var(axis=0))
+    np.testing.assert_allclose(stats.min, X.min(axis=0))
+    expected = np.histogram(X[:, 0], bins=edges[0])[0]
+    np.testing.assert_array_equal(stats.histogram[0, 1:-1], expected)
+    assert stats.histogram[0, 0] == (X[:, 0] < 0).sum()
+    assert stats.histogram[0, -1] == (X[:, 0] > 10).sum()
+
+
+def test_shifted_traffic_raises_psi_and_mean_shift():
+    rng = np.random.default_rng(2)
+    train = rng.normal(0.0, 1.0, size=(2000, 2))
+    monitor = DriftMonitor(training_stats(train), n_features=2, flush_rows=64)
+    for row in rng.normal(0.0, 1.0, size=(500, 2)):
+        monitor.observe([row])
+    same = monitor.report()["features"][0]
+    assert same["psi"] < 0.1 and abs(same["mean_shift"]) < 0.2
+
+    shifted = DriftMonitor(training_stats(train), n_features=2)
+    shifted.observe(rng.normal(1.5, 1.0, size=(500, 2)))
+    moved = shifted.report()["features"][0]
+    assert moved["psi"] > 0.5 and moved["mean_shift"] > 1.0
+
+
+def test_without_training_stats_reports_live_only():
+    monitor = DriftMonitor(None, n_features=2)
+    monitor.observe([[1.0, 2.0], [3.0, 4.0]])
+    report = monitor.report()
+    assert report["count"] == 2
+    assert report["features"][1]["live"]["mean"] == 3.0
+    assert "psi" not in report["features"][1]
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from executor import InferenceExecutor
+from predictor import init_worker, worker_predict
+
+MODEL_FILE = os.path.join(os.path.dirname(__file__), "model", "model.joblib")
+
+
+def test_queue_depth_and_saturation():
+    async def scenario():
+        ex = InferenceExecutor(workers=2)
+        gate = threading.Event()
+        tasks = [asyncio.ensure_future(ex.run(gate.wait, 5)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert ex.in_flight == 3
+        assert ex.queue_depth == 1
+        assert ex.saturation == 1.0
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert ex.in_flight == 0
+        assert ex.completed == 3
+        assert "hello_api_inference_queue_depth 0" in ex.prometheus_lines()
+        ex.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_failures_are_counted():
+    async def scenario():
+        ex = InferenceExecutor(workers=1)
+        with pytest.raises(ZeroDivisionError):
+            await ex.run(divmod, 1, 0)
+        assert ex.failed == 1 and ex.in_flight == 0
+        ex.shutdown()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.skipif(not os.path.exists(MODEL_FILE), reason="model bundle not built")
+def test_process_workers_load_their_own_model():
+    ex = InferenceExecutor(kind="process", workers=1, initializer=init_worker, initargs=(MODEL_FILE,))
+    try:
+        result = ex.run_sync(worker_predict, [[5.1, 3.5, 1.4, 0.2]], None, False)
+    finally:
+        ex.shutdown()
+    assert result == [{"class_id": 0, "class_name": "setosa"}]
+
+
+@pytest.mark.skipif(not os.path.exists(MODEL_FILE), reason="model bundle not built")
+def test_warm_starts_and_warms_every_process_worker():
+    ex = InferenceExecutor(kind="process", workers=3, initializer=init_worker, initargs=(MODEL_FILE,))
+    try:
+        pids = ex.warm(worker_predict, [[5.1, 3.5, 1.4, 0.2]], None, False)
+        assert len(set(pids)) == 3
+        assert {p.pid for p in ex.pool._processes.values()} == set(pids)
+        assert len(set(ex.warm(worker_predict, [[5.1, 3.5, 1.4, 0.2]], None, False))) == 3
+    finally:
+        ex.shutdown()
+
+
+def test_warm_runs_once_per_thread_worker():
+    calls = []
+    ex = InferenceExecutor(workers=2)
+    try:
+        assert ex.warm(calls.append, 1) == [os.getpid(), os.getpid()]
+        assert calls == [1, 1]
+    finally:
+        ex.shutdown()
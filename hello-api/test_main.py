@@ -1,3 +1,5 @@
+import time
+
 from main import app, VERSION
 from fastapi.testclient import TestClient
 
@@ -24,3 +26,48 @@ def test_predict_setosa():
     body = resp.json()
     assert body["class_id"] == 0
     assert body["class_name"].lower().startswith("setosa")
+
+
+def test_metrics_reports_admission():
+    client.post("/predict", json={"features": [5.1, 3.5, 1.4, 0.2]})
+    body = client.get("/metrics").text
+    assert "hello_api_predict_admitted_total" in body
+    assert 'hello_api_predict_shed_total{reason="queue_full"}' in body
+    assert "hello_api_inference_saturation" in body
+    assert 'hello_api_inference_tasks_total{outcome="ok"}' in body
+
+
+def test_readyz_after_warmup():
+    with TestClient(app) as warm_client:
+        deadline = time.time() + 10
+        while warm_client.get("/readyz").status_code != 200 and time.time() < deadline:
+            time.sleep(0.05)
+        assert warm_client.get("/readyz").json() == {"status": "ready"}
+
+
+def test_predict_top_k_and_probabilities():
+    resp = client.post("/predict", json={"features": [5.1, 3.5, 1.4, 0.2], "top_k": 2, "return_proba": True})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["class_id"] == 0
+    assert abs(sum(body["probabilities"].values()) - 1.0) < 1e-6
+    top = body["top_k"]
+    assert top[0]["class_id"] == 0
+    assert len(top) == 2 and top[0]["probability"] >= top[1]["probability"]
+
+
+def test_predict_batch():
+    resp = client.post("/predict/batch", json={"instances": [[5.1, 3.5, 1.4, 0.2], [6.7, 3.0, 5.2, 2.3]], "top_k": 3})
+    assert resp.status_code == 200
+    preds = resp.json()["predictions"]
+    assert [p["class_id"] for p in preds] == [0, 2]
+    assert all(len(p["top_k"]) == 3 for p in preds)
+    assert client.post("/predict/batch", json={"instances": [[1.0, 2.0]]}).status_code == 400
+
+
+def test_drift_counts_scored_rows():
+    before = client.get("/drift").json()["count"]
+    client.post("/predict/batch", json={"instances": [[5.1, 3.5, 1.4, 0.2], [6.2, 2.9, 4.3, 1.3]]})
+    report = client.get("/drift").json()
+    assert report["count"] == before + 2
+    assert len(report["features"]) == 4
@@ -0,0 +1,69 @@
+import hashlib
+import os
+
+import httpx
+import pytest
+
+import model_store
+from model_store import ModelCache, ModelFetchError, S3Client, fetch_model
+
+BLOB = os.urandom(100_000)
+BLOB_SHA = hashlib.sha256(BLOB).hexdigest()
+
+
+def make_client(calls):
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        assert request.headers["authorization"].startswith("AWS4-HMAC-SHA256 Credential=key/")
+        if request.url.path != "/ml-models/iris.joblib":
+            return httpx.Response(404)
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"content-length": str(len(BLOB))})
+        rng = request.headers.get("range")
+        if rng:
+            start, end = (int(x) for x in rng[len("bytes="):].split("-"))
+            return httpx.Response(206, content=BLOB[start:end + 1])
+        return httpx.Response(200, content=BLOB)
+
+    return S3Client("http://minio:9000", "key", "secret", transport=httpx.MockTransport(handler))
+
+
+def test_ranged_download_is_verified_and_cached(tmp_path):
+    calls = []
+    cache = ModelCache(str(tmp_path))
+    path = fetch_model(make_client(calls), cache, "ml-models/iris.joblib", BLOB_SHA, part_size=16_384)
+
+    assert path == cache.path_for(BLOB_SHA)
+    with open(path, "rb") as f:
+        assert f.read() == BLOB
+    assert sum(1 for c in calls if c.method == "GET") == 7
+
+    calls.clear()
+    assert fetch_model(make_client(calls), cache, "ml-models/iris.joblib", BLOB_SHA) == path
+    assert calls == []
+
+
+def test_unverifiable_sha_uses_object_alias(tmp_path):
+    calls = []
+    cache = ModelCache(str(tmp_path))
+    path = fetch_model(make_client(calls), cache, "ml-models/iris.joblib", "seed")
+    calls.clear()
+    assert fetch_model(make_client(calls), cache, "ml-models/iris.joblib", "seed") == path
+    assert calls == []
+
+
+def test_sha_mismatch_is_rejected(tmp_path):
+    cache = ModelCache(str(tmp_path))
+    with pytest.raises(ModelFetchError):
+        fetch_model(make_client([]), cache, "ml-models/iris.joblib", "0" * 64, retries=1)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith((".joblib", ".part"))]
+
+
+def test_env_fetch_retry_budget_can_be_overridden(tmp_path, monkeypatch):
+    seen = []
+    monkeypatch.setenv("MODEL_S3_ENDPOINT", "http://minio:9000")
+    monkeypatch.setenv("MODEL_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(model_store, "fetch_model", lambda *args, retries, **kwargs: seen.append(retries) or "model.joblib")
+    model_store.fetch_model_from_env("ml-models/iris.joblib", None)
+    model_store.fetch_model_from_env("ml-models/shadow.joblib", None, retries=1)
+    assert seen == [30, 1]
@@ -0,0 +1,46 @@
+import time
+
+from shadow import ShadowComparator
+
+
+class FixedPredictor:
+    def __init__(self, class_id, delay=0.0):
+        self.class_id = class_id
+        self.delay = delay
+
+    def predict(self, rows):
+        time.sleep(self.delay)
+        return [{"class_id": self.class_id, "class_name": str(self.class_id)} for _ in rows]
+
+
+def primary(*ids):
+    return [{"class_id": i, "class_name": str(i)} for i in ids]
+
+
+def test_agreement_and_latency_delta():
+    shadow = ShadowComparator(FixedPredictor(0, delay=0.01), sample_rate=1.0, cpu_budget=1.0)
+    shadow.start()
+    shadow.offer([[1, 2, 3, 4], [5, 6, 7, 8]], primary(0, 2), 0.001)
+    shadow.offer([[1, 2, 3, 4]], primary(0), 0.001)
+    shadow.stop(drain=True)
+
+    stats = shadow.stats()
+    assert stats["compared"] == 3
+    assert stats["agreement"] == 2 / 3
+    assert stats["mean_latency_delta_seconds"] > 0.005
+
+
+def test_offer_never_blocks_when_queue_is_full():
+    shadow = ShadowComparator(FixedPredictor(0), sample_rate=1.0, max_queue=1)
+    started = time.perf_counter()
+    for _ in range(5):
+        shadow.offer([[1, 2, 3, 4]], primary(0), 0.001)
+    assert time.perf_counter() - started < 0.05
+    assert shadow.sampled == 1
+    assert shadow.dropped == 4
+
+
+def test_sampling_rate_zero_mirrors_nothing():
+    shadow = ShadowComparator(FixedPredictor(0), sample_rate=0.0)
+    shadow.offer([[1, 2, 3, 4]], primary(0), 0.001)
+    assert shadow.stats()["sampled"] == 0
@@ -0,0 +1,163 @@
+"""
+Score a large feature file offline with the bundle train.py produces.
+
+The bundle is loaded once in the parent before the worker pool forks, so the
+workers share the model pages copy-on-write instead of each unpickling it.
+Input is split into row ranges: .npy files are memory-mapped and workers
+read their range straight from the page cache; CSV is parsed once in the
+parent and inherited the same way. Chunks are scored vectorized and written
+in input order.
+
+Example:
+  python score.py --model ../hello-api/model/model.joblib --input features.npy --output scores.csv
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import pathlib
+import sys
+import time
+
+import joblib
+import numpy as np
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+# Set in the parent before the pool starts; fork children inherit them as-is
+_BUNDLE = None
+_X = None
+
+
+def load_features(path: pathlib.Path) -> np.ndarray:
+    if path.suffix == ".npy":
+        X = np.load(path, mmap_mode="r")
+    else:
+        with path.open(encoding="utf-8") as f:
+            first = f.readline().split(",")
+        try:
+            [float(v) for v in first]
+            skip = 0
+        except ValueError:
+            # Header row (e.g. feature names)
+            skip = 1
+        X = np.loadtxt(path, delimiter=",", skiprows=skip, ndmin=2)
+    if X.ndim != 2:
+        raise ValueError(f"{path}: expected a 2-D feature matrix, got shape {X.shape}")
+    return X
+
+
+def chunk_ranges(n_rows: int, chunk_rows: int):
+    return [(start, min(start + chunk_rows, n_rows)) for start in range(0, n_rows, chunk_rows)]
+
+
+def score_rows(bundle: dict, X: np.ndarray, with_proba: bool):
+    model = bundle["model"]
+    X = np.asarray(X, dtype=float)
+    if with_proba:
+        proba = model.predict_proba(X)
+        return model.classes_[proba.argmax(axis=1)], proba
+    return np.asarray(model.predict(X)), None
+
+
+def _init_worker(model_path, input_path):
+    # Only used without fork (Windows/macOS spawn): each worker loads its own copy
+    global _BUNDLE, _X
+    if _BUNDLE is None:
+        _BUNDLE = joblib.load(model_path)
+    if _X is None and input_path is not None:
+        _X = load_features(pathlib.Path(input_path))
+
+
+def _score_chunk(task):
+    start, stop, with_proba = task
+    return score_rows(_BUNDLE, _X[start:stop], with_proba)
+
+
+def score(model_path: pathlib.Path, input_path: pathlib.Path, output: pathlib.Path, workers: int,
+          chunk_rows: int = DEFAULT_CHUNK_ROWS, with_proba: bool = False) -> dict:
+    global _BUNDLE, _X
+    started = time.perf_counter()
+    _BUNDLE = joblib.load(model_path)
+    _X = load_features(input_path)
+    n_features = getattr(_BUNDLE["model"], "n_features_in_", _X.shape[1])
+    if _X.shape[1] != n_features:
+        raise ValueError(f"{input_path}: {_X.shape[1]} features per row, model expects {n_features}")
+    loaded = time.perf_counter()
+
+    names = list(_BUNDLE.get("target_names") or [])
+    classes = np.asarray(_BUNDLE["model"].classes_).astype(int).tolist()
+    tasks = [(start, stop, with_proba) for start, stop in chunk_ranges(_X.shape[0], chunk_rows)]
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        ctx, initargs = multiprocessing.get_context("fork"), (None, None)
+    else:
+        ctx, initargs = multiprocessing.get_context("spawn"), (str(model_path), str(input_path))
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    with output.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        header = ["row", "class_id", "class_name"]
+        if with_proba:
+            header += [f"p_{names[c] if 0 <= c < len(names) else c}" for c in classes]
+        writer.writerow(header)
+
+        def write(ids, proba):
+            nonlocal rows
+            ids = ids.astype(int).tolist()
+            for i, class_id in enumerate(ids):
+                row = [rows + i, class_id, names[class_id] if 0 <= class_id < len(names) else class_id]
+                if proba is not None:
+                    row += [f"{p:.6f}" for p in proba[i]]
+                writer.writerow(row)
+            rows += len(ids)
+
+        if workers <= 1 or len(tasks) <= 1:
+            for task in tasks:
+                write(*_score_chunk(task))
+        else:
+            with ctx.Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+                # imap keeps input order while later chunks are still being scored
+                for ids, proba in pool.imap(_score_chunk, tasks):
+                    write(ids, proba)
+
+    finished = time.perf_counter()
+    scoring = finished - loaded
+    return {
+        "rows": rows, "chunks": len(tasks), "workers": workers, "start_method": ctx.get_start_method(),
+        "load_seconds": loaded - started, "score_seconds": scoring,
+        "rows_per_second": rows / scoring if scoring > 0 else float("inf"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--model",
+        type=pathlib.Path,
+        default=pathlib.Path(__file__).parent.parent / "hello-api" / "model" / "model.joblib",
+    )
+    parser.add_argument("--input", type=pathlib.Path, required=True, help=".npy (memory-mapped) or .csv feature matrix")
+    parser.add_argument("--output", type=pathlib.Path, required=True)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--proba", action="store_true", help="add a probability column per class")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error(f"--workers must be at least 1, got {args.workers}")
+    if args.chunk_rows < 1:
+        parser.error(f"--chunk-rows must be at least 1, got {args.chunk_rows}")
+
+    stats = score(args.model, args.input, args.output, args.workers, args.chunk_rows, args.proba)
+    print(
+        f"[score] {stats['rows']} rows in {stats['chunks']} chunks, {stats['workers']} workers "
+        f"({stats['start_method']}): load {stats['load_seconds']:.2f}s, score {stats['score_seconds']:.2f}s, "
+        f"{stats['rows_per_second']:.0f} rows/s -> {args.output}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
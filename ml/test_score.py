@@ -0,0 +1,59 @@
+import csv
+
+import numpy as np
+import pytest
+from sklearn import datasets
+
+from score import main, score
+from train import train
+
+
+@pytest.fixture(scope="module")
+def bundle(tmp_path_factory):
+    path = tmp_path_factory.mktemp("model") / "model.joblib"
+    train(path)
+    return path
+
+
+def read_rows(path):
+    with path.open(encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_scores_keep_input_order_and_class_names(bundle, tmp_path):
+    iris = datasets.load_iris()
+    features = tmp_path / "features.csv"
+    np.savetxt(features, iris.data, delimiter=",", header=",".join(iris.feature_names), comments="")
+
+    stats = score(bundle, features, tmp_path / "scores.csv", workers=2, chunk_rows=40, with_proba=True)
+    rows = read_rows(tmp_path / "scores.csv")
+    assert rows[0] == ["row", "class_id", "class_name", "p_setosa", "p_versicolor", "p_virginica"]
+    assert [int(r[0]) for r in rows[1:]] == list(range(150))
+    assert (rows[1][2], rows[51][2], rows[150][2]) == ("setosa", "versicolor", "virginica")
+    assert all(abs(sum(float(p) for p in r[3:]) - 1) < 1e-4 for r in rows[1:])
+    assert (stats["rows"], stats["chunks"]) == (150, 4)
+
+
+def test_forked_chunks_match_a_single_worker(bundle, tmp_path):
+    features = tmp_path / "features.npy"
+    np.save(features, np.random.default_rng(0).uniform(0, 8, size=(5000, 4)))
+
+    pooled = score(bundle, features, tmp_path / "pooled.csv", workers=4, chunk_rows=700)
+    single = score(bundle, features, tmp_path / "single.csv", workers=1)
+    assert pooled["chunks"] == 8 and single["chunks"] == 1
+    assert read_rows(tmp_path / "pooled.csv") == read_rows(tmp_path / "single.csv")
+
+
+def test_feature_count_mismatch_is_rejected(bundle, tmp_path):
+    features = tmp_path / "features.npy"
+    np.save(features, np.ones((10, 3)))
+    with pytest.raises(ValueError, match="3 features per row, model expects 4"):
+        score(bundle, features, tmp_path / "scores.csv", workers=1)
+
+
+@pytest.mark.parametrize("option, value", [("--workers", "0"), ("--chunk-rows", "0"), ("--chunk-rows", "-5")])
+def test_cli_rejects_non_positive_sizes(option, value, tmp_path, capsys):
+    with pytest.raises(SystemExit) as exc:
+        main(["--input", str(tmp_path / "features.npy"), "--output", str(tmp_path / "scores.csv"), option, value])
+    assert exc.value.code == 2
+    assert f"{option} must be at least 1" in capsys.readouterr().err
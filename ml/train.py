@@ -11,11 +11,28 @@ import os
 import pathlib
 
 import joblib
+import numpy as np
 from sklearn import datasets
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 
 
+def feature_stats(X, feature_names, bins: int = 10) -> dict:
+    """Training-time per-feature summary; hello-api compares live traffic against it."""
+    X = np.asarray(X, dtype=float)
+    edges = [np.linspace(col.min(), col.max(), bins + 1) for col in X.T]
+    return {
+        "feature_names": list(feature_names),
+        "count": int(X.shape[0]),
+        "mean": X.mean(axis=0).tolist(),
+        "variance": X.var(axis=0).tolist(),
+        "min": X.min(axis=0).tolist(),
+        "max": X.max(axis=0).tolist(),
+        "bin_edges": [e.tolist() for e in edges],
+        "histogram": [np.histogram(col, bins=e)[0].tolist() for col, e in zip(X.T, edges)],
+    }
+
+
 def train(output: pathlib.Path):
     iris = datasets.load_iris()
     X_train, X_test, y_train, y_test = train_test_split(
@@ -24,7 +41,12 @@ def train(output: pathlib.Path):
     model = LogisticRegression(max_iter=200, random_state=42)
     model.fit(X_train, y_train)
     acc = model.score(X_test, y_test)
-    bundle = {"model": model, "target_names": list(iris.target_names), "accuracy": acc}
+    bundle = {
+        "model": model,
+        "target_names": list(iris.target_names),
+        "accuracy": acc,
+        "feature_stats": feature_stats(X_train, iris.feature_names),
+    }
     output.parent.mkdir(parents=True, exist_ok=True)
     joblib.dump(bundle, output)
     sha = hashlib.sha256(output.read_bytes()).hexdigest()
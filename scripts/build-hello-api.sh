@@ -0,0 +1,47 @@
+#!/bin/sh
+# Build hello-api on top of a dependency image keyed on requirements.txt.
+#
+# Usage: build-hello-api.sh <image:tag> [context]
+#
+# The dependency image (<image>-deps:<hash>) is reused when it exists locally or
+# in the registry, so code-only changes only rebuild the final COPY layer.
+# Env: CONTAINER_ENGINE (docker), PYTHON_IMAGE (python:3.10-slim),
+#      HELLO_API_DEPS_PUSH=1 to push a freshly built dependency image.
+set -eu
+
+IMAGE="$1"
+CONTEXT="${2:-hello-api}"
+ENGINE="${CONTAINER_ENGINE:-docker}"
+PYTHON_IMAGE="${PYTHON_IMAGE:-python:3.10-slim}"
+
+REQ_HASH=$( (echo "$PYTHON_IMAGE"; cat "$CONTEXT/requirements.txt") | sha256sum | cut -c1-12)
+DEPS_IMAGE="${IMAGE%:*}-deps:${REQ_HASH}"
+
+log() { echo "[build] $*"; }
+
+START=$(date +%s)
+
+if $ENGINE image inspect "$DEPS_IMAGE" >/dev/null 2>&1; then
+    DEPS_STATUS="cached"
+elif $ENGINE pull "$DEPS_IMAGE" >/dev/null 2>&1; then
+    DEPS_STATUS="pulled"
+else
+    log "Building dependency image $DEPS_IMAGE..."
+    $ENGINE build --target deps --build-arg PYTHON_IMAGE="$PYTHON_IMAGE" \
+        -t "$DEPS_IMAGE" -f "$CONTEXT/Dockerfile" "$CONTEXT"
+    DEPS_STATUS="built"
+    if [ "${HELLO_API_DEPS_PUSH:-0}" = "1" ]; then
+        $ENGINE push "$DEPS_IMAGE" || log "WARN: could not push $DEPS_IMAGE"
+    fi
+fi
+DEPS_DONE=$(date +%s)
+
+log "Building $IMAGE on $DEPS_IMAGE..."
+$ENGINE build --build-arg PYTHON_IMAGE="$PYTHON_IMAGE" --build-arg DEPS_IMAGE="$DEPS_IMAGE" \
+    -t "$IMAGE" -f "$CONTEXT/Dockerfile" "$CONTEXT"
+APP_DONE=$(date +%s)
+
+log "Build timing:"
+log "  deps  $DEPS_IMAGE  $DEPS_STATUS  $((DEPS_DONE - START))s"
+log "  app   $IMAGE  built  $((APP_DONE - DEPS_DONE))s"
+log "  total $((APP_DONE - START))s"
@@ -0,0 +1,109 @@
+"""
+Make Argo CD pick up a GitOps commit right away instead of on its next repo
+poll (every 3 minutes by default), then watch the Application until it
+reports that commit as Synced and Healthy.
+
+Two triggers, both leave the actual sync to Argo CD's automated policy:
+  * notify_webhook(): POST a Gitea push event to argocd-server's /api/webhook.
+    Argo CD matches it against Applications by repository URL, so the event
+    carries the URL the Applications use (http://gitea:3000/...), not Gitea's
+    public ROOT_URL. Needs only HTTP access, which is what CI has.
+  * hard_refresh(): set argocd.argoproj.io/refresh=hard on the Application
+    with kubectl; used where a kubeconfig is at hand (e2e runner).
+
+Usage (Woodpecker update-gitops step):
+  python tests/argocd.py \
+      --webhook-url http://k3d-gitopslab-server-0:30081/api/webhook \
+      --repo-url http://gitea:3000/gitops/platform.git \
+      --revision "$(git rev-parse HEAD)" \
+      gitops/apps/hello/deployment.yaml gitops/apps/hello/model-configmap.yaml
+"""
+import argparse
+import json
+import sys
+import time
+import urllib.request
+from typing import Callable, Dict, Optional, Sequence
+
+ARGOCD_NAMESPACE = "argocd"
+STATUS_JSONPATH = "{.status.sync.status}|{.status.sync.revision}|{.status.health.status}|{.status.operationState.phase}"
+
+
+class ArgoCDSyncError(Exception):
+    pass
+
+
+def push_event(repo_url: str, revision: str, files: Sequence[str], branch: str = "main") -> Dict:
+    web_url = repo_url[:-4] if repo_url.endswith(".git") else repo_url
+    return {
+        "ref": f"refs/heads/{branch}",
+        "after": revision,
+        "repository": {"html_url": web_url, "clone_url": repo_url, "default_branch": branch},
+        # Argo CD uses the touched paths for Applications annotated with manifest-generate-paths
+        "commits": [{"id": revision, "added": [], "removed": [], "modified": list(files)}],
+    }
+
+
+def notify_webhook(webhook_url: str, repo_url: str, revision: str, files: Sequence[str],
+                   branch: str = "main", timeout: float = 10.0) -> int:
+    req = urllib.request.Request(
+        webhook_url,
+        data=json.dumps(push_event(repo_url, revision, files, branch)).encode("utf-8"),
+        method="POST",
+        # Argo CD parses Gitea pushes with its Gogs handler, keyed on X-Gogs-Event
+        headers={"Content-Type": "application/json", "X-Gitea-Event": "push", "X-Gogs-Event": "push"},
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.status
+
+
+def hard_refresh(app: str, kubectl: Callable[[str], str], namespace: str = ARGOCD_NAMESPACE):
+    kubectl(f"kubectl -n {namespace} annotate application {app} argocd.argoproj.io/refresh=hard --overwrite")
+
+
+def app_status(app: str, kubectl: Callable[[str], str], namespace: str = ARGOCD_NAMESPACE) -> Dict[str, str]:
+    out = kubectl(f"kubectl -n {namespace} get application {app} -o jsonpath='{STATUS_JSONPATH}'")
+    sync, revision, health, phase = (out.strip().strip("'").split("|") + ["", "", "", ""])[:4]
+    return {"sync": sync, "revision": revision, "health": health, "phase": phase}
+
+
+def wait_for_app(app: str, kubectl: Callable[[str], str], revision: Optional[str] = None,
+                 namespace: str = ARGOCD_NAMESPACE, timeout: float = 300, interval: float = 2) -> Dict[str, str]:
+    """Poll until the Application is Synced (at `revision`, if given) and Healthy."""
+    started = time.time()
+    last = None
+    while time.time() - started < timeout:
+        status = app_status(app, kubectl, namespace)
+        if status != last:
+            print(f"[argocd] {app}: sync={status['sync']} health={status['health']} "
+                  f"revision={status['revision'][:12]} operation={status['phase'] or '-'} (+{time.time() - started:.0f}s)")
+            last = status
+        at_revision = not revision or status["revision"] == revision
+        if at_revision and status["phase"] in ("Failed", "Error"):
+            raise ArgoCDSyncError(f"{app} sync {status['phase']} at {status['revision'][:12]}")
+        if at_revision and status["sync"] == "Synced" and status["health"] == "Healthy":
+            return status
+        time.sleep(interval)
+    raise ArgoCDSyncError(f"{app} not Synced/Healthy at {revision or 'HEAD'} after {timeout}s: {last}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Notify Argo CD about a pushed GitOps commit.")
+    parser.add_argument("--webhook-url", required=True)
+    parser.add_argument("--repo-url", required=True, help="Repository URL exactly as the Applications reference it")
+    parser.add_argument("--revision", required=True)
+    parser.add_argument("--branch", default="main")
+    parser.add_argument("files", nargs="*")
+    args = parser.parse_args(argv)
+
+    try:
+        status = notify_webhook(args.webhook_url, args.repo_url, args.revision, args.files, args.branch)
+    except Exception as e:
+        print(f"[argocd] webhook {args.webhook_url} failed: {e}", file=sys.stderr)
+        return 1
+    print(f"[argocd] webhook accepted ({status}) for {args.repo_url}@{args.revision[:12]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
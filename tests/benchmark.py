@@ -0,0 +1,136 @@
+"""
+Commit-to-serving benchmark for the e2e loop.
+
+Each run records a Timeline: named marks (commit pushed, pipeline created,
+model uploaded, manifests committed, Argo CD synced, pod ready, first
+/version with the new MODEL_SHA) and spans (e2e stages, Woodpecker steps).
+summarize() reduces N runs to medians plus the most frequent critical path;
+write_report() stores both as JSON (for tracking over time) and Markdown.
+"""
+import json
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class Timeline:
+    def __init__(self):
+        self.marks: Dict[str, float] = {}
+        self.spans: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name: str, at: Optional[float] = None):
+        with self._lock:
+            # First occurrence wins: "first /version with the new SHA" must not move on retries
+            self.marks.setdefault(name, time.time() if at is None else float(at))
+
+    def span(self, name: str, start: Optional[float], end: Optional[float]):
+        if start and end:
+            with self._lock:
+                self.spans[name] = (float(start), float(end))
+
+
+def run_record(index: int, runner, timeline: Timeline, origin_mark: str = "commit",
+               target: Optional[str] = None, error: Optional[BaseException] = None) -> Dict[str, Any]:
+    """Offsets (seconds) of one StageRunner run, relative to the runner start."""
+    t0 = runner.t0
+    stages = {
+        s.name: {"status": s.status, "start": s.started - t0, "duration": s.duration}
+        for s in runner.stages.values() if s.started is not None
+    }
+    events = {name: at - t0 for name, at in sorted(timeline.marks.items(), key=lambda kv: kv[1])}
+    spans = {name: {"start": start - t0, "duration": end - start} for name, (start, end) in timeline.spans.items()}
+    origin = events.get(origin_mark)
+    last = max(events.values()) if events else None
+    return {
+        "run": index,
+        "ok": error is None,
+        "error": None if error is None else f"{type(error).__name__}: {error}",
+        "started_at": t0,
+        "origin": origin_mark,
+        # Headline number: push to Gitea -> hello-api serving the new model
+        "commit_to_serving": events["serving"] - origin if origin is not None and "serving" in events else None,
+        "wall_clock": last,
+        "events": events,
+        "stages": stages,
+        "spans": spans,
+        "critical_path": [s.name for s in runner.critical_path(target)],
+    }
+
+
+def _stats(values: List[float]) -> Dict[str, Any]:
+    return {"n": len(values), "median": statistics.median(values), "min": min(values), "max": max(values)}
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [r for r in runs if r["ok"]]
+    summary: Dict[str, Any] = {"runs": len(runs), "ok": len(ok)}
+    headline = [r["commit_to_serving"] for r in ok if r["commit_to_serving"] is not None]
+    summary["commit_to_serving"] = _stats(headline) if headline else None
+
+    def collect(section: str, field: str) -> Dict[str, Dict[str, Any]]:
+        values: Dict[str, List[float]] = {}
+        for r in ok:
+            for name, v in r[section].items():
+                values.setdefault(name, []).append(v if field is None else v[field])
+        return {name: _stats(v) for name, v in values.items()}
+
+    summary["events"] = collect("events", None)
+    summary["stages"] = collect("stages", "duration")
+    summary["spans"] = collect("spans", "duration")
+
+    paths = Counter(tuple(r["critical_path"]) for r in ok if r["critical_path"])
+    if paths:
+        path, count = paths.most_common(1)[0]
+        summary["critical_path"] = {
+            "stages": list(path),
+            "runs": count,
+            "median_durations": {name: summary["stages"][name]["median"] for name in path if name in summary["stages"]},
+        }
+    return summary
+
+
+def render_markdown(summary: Dict[str, Any], runs: List[Dict[str, Any]]) -> str:
+    lines = ["# E2E commit-to-serving benchmark", "",
+             f"Runs: {summary['runs']} ({summary['ok']} successful)", ""]
+    headline = summary.get("commit_to_serving")
+    if headline:
+        lines += [f"**Commit to serving:** median {headline['median']:.1f}s "
+                  f"(min {headline['min']:.1f}s, max {headline['max']:.1f}s, n={headline['n']})", ""]
+
+    def table(title: str, rows: Dict[str, Dict[str, Any]], column: str):
+        if not rows:
+            return
+        lines.extend([f"## {title}", "", f"| {column} | median | min | max | n |", "|---|---:|---:|---:|---:|"])
+        for name, s in sorted(rows.items(), key=lambda kv: kv[1]["median"]):
+            lines.append(f"| {name} | {s['median']:.1f}s | {s['min']:.1f}s | {s['max']:.1f}s | {s['n']} |")
+        lines.append("")
+
+    table("Events (offset from run start)", summary["events"], "event")
+    table("Stages (duration)", summary["stages"], "stage")
+    table("Woodpecker steps and other spans (duration)", summary["spans"], "span")
+
+    path = summary.get("critical_path")
+    if path:
+        lines += [f"## Critical path ({path['runs']}/{summary['ok']} runs)", "", "| stage | median |", "|---|---:|"]
+        lines += [f"| {name} | {d:.1f}s |" for name, d in path["median_durations"].items()]
+        lines.append("")
+
+    failed = [r for r in runs if not r["ok"]]
+    if failed:
+        lines += ["## Failed runs", ""] + [f"- run {r['run']}: {r['error']}" for r in failed] + [""]
+    return "\n".join(lines)
+
+
+def write_report(runs: List[Dict[str, Any]], path: str) -> Dict[str, Any]:
+    """Write `<path>.json` and `<path>.md`; returns the summary."""
+    summary = summarize(runs)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        json.dump({"generated_at": time.time(), "summary": summary, "runs": runs}, f, indent=2)
+    with open(f"{path}.md", "w", encoding="utf-8") as f:
+        f.write(render_markdown(summary, runs))
+    return summary
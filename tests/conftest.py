@@ -1,6 +1,81 @@
 import os
+import sys
+import time
+from collections import defaultdict
 import pytest
 
+from tests.logcollector import PLATFORM_CONTAINERS, LogCollector
+from tests.tracing import TRACER, configured_trace_path, span
+
+# nodeid -> {"setup"/"call"/"teardown": seconds, "outcome", "worker"}
+TEST_TIMINGS = defaultdict(dict)
+SESSION_STARTED = time.time()
+# nodeid -> wall-clock start, for slicing captured logs around a failure
+TEST_STARTED = {}
+# Set by the platform_logs fixture once any platform test runs
+LOG_COLLECTOR = None
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "xdist_group(name): run all tests of the group in the same xdist worker")
+    # Plain `-n N` means --dist load, which would rebuild the session fixtures (and re-run the scenario)
+    # in every worker; loadgroup keeps xdist_group("e2e-flow") tests on one worker.
+    # xdist has already turned `-n` into `load` here, so an explicit --dist is detected from the command line.
+    if getattr(config.option, "numprocesses", None) and getattr(config.option, "dist", "no") == "load":
+        args = list(config.invocation_params.args) + os.environ.get("PYTEST_ADDOPTS", "").split()
+        if any(a == "--dist" or a.startswith("--dist=") for a in args):
+            return
+        config.option.dist = "loadgroup"
+        sys.stderr.write("[xdist] -n without --dist: using --dist loadgroup so the e2e-flow group shares one worker\n")
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item):
+    # Setup (session fixtures), call and teardown all nest under the test's span
+    TEST_STARTED[item.nodeid] = time.time()
+    with span(item.nodeid, "test"):
+        yield
+
+
+def pytest_sessionfinish(session):
+    path = configured_trace_path("pytest", default_on=False)
+    if not path or not TRACER.spans:
+        return
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    if worker:
+        root, ext = os.path.splitext(path)
+        path = f"{root}-{worker}{ext}"
+    print(f"\n[trace] Trace written to {TRACER.export(path)}")
+
+
+def pytest_runtest_logreport(report):
+    timing = TEST_TIMINGS[report.nodeid]
+    timing[report.when] = report.duration
+    node = getattr(report, "node", None)
+    gateway = getattr(node, "gateway", None)
+    timing["worker"] = getattr(gateway, "id", "main")
+    if report.when == "call" or report.outcome != "passed":
+        timing["outcome"] = report.outcome
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not TEST_TIMINGS:
+        return
+    wall = time.time() - SESSION_STARTED
+    rows = sorted(TEST_TIMINGS.items(), key=lambda kv: -sum(kv[1].get(p, 0.0) for p in ("setup", "call", "teardown")))
+    tr = terminalreporter
+    tr.section("timing report")
+    tr.write_line(f"{'test':<60} {'worker':>6} {'setup':>8} {'call':>8} {'total':>8}  outcome")
+    total = 0.0
+    for nodeid, t in rows:
+        spent = sum(t.get(p, 0.0) for p in ("setup", "call", "teardown"))
+        total += spent
+        # setup includes the session fixtures a test was the first to need
+        name = nodeid if len(nodeid) <= 60 else "..." + nodeid[-57:]
+        tr.write_line(f"{name:<60} {t.get('worker', ''):>6} {t.get('setup', 0.0):>8.2f} {t.get('call', 0.0):>8.2f} {spent:>8.2f}  {t.get('outcome', '')}")
+    tr.write_line(f"wall clock {wall:.2f}s, sum of tests {total:.2f}s (x{total / wall if wall else 0:.2f} parallelism)")
+
+
 @pytest.fixture(scope="session", autouse=True)
 def load_env():
     env_path = os.path.join(os.path.dirname(__file__), "..", ".env")
@@ -13,13 +88,39 @@ def load_env():
                 k, v = line.split("=", 1)
                 os.environ.setdefault(k.strip(), v.strip())
 
+@pytest.fixture(scope="session")
+def platform_logs():
+    """Stream platform container logs into ring buffers for the whole session (see tests/logcollector.py)"""
+    global LOG_COLLECTOR
+    if os.environ.get("E2E_LOG_CAPTURE", "").lower() in ("off", "0", "false"):
+        yield None
+        return
+    cluster = os.environ.get("K3D_CLUSTER_NAME", "gitopslab")
+    collector = LogCollector(PLATFORM_CONTAINERS + [f"k3d-{cluster}-server-0"])
+    if not collector.available:
+        yield None
+        return
+    LOG_COLLECTOR = collector.start()
+    yield collector
+    collector.stop()
+    LOG_COLLECTOR = None
+
 @pytest.hookimpl(tryfirst=True, hookwrapper=True)
 def pytest_runtest_makereport(item, call):
     # Execute all other hooks to obtain the report object
     outcome = yield
     report = outcome.get_result()
 
-    if report.when == "call" and report.failed:
+    if report.failed and report.when in ("setup", "call") and LOG_COLLECTOR is not None:
+        # Buffers already hold the logs: one write, no engine round trips
+        bundle = LOG_COLLECTOR.write_bundle(item.nodeid, TEST_STARTED.get(item.nodeid, call.start), call.stop,
+                                            report=report.longreprtext)
+        print(f"\n[FAILURE] Test {item.name} failed during {report.when}. Diagnostics: {bundle}")
+        for name, buf in LOG_COLLECTOR.buffers.items():
+            if name.split("-")[0] in item.name.lower():
+                for ts, stream, text in buf.tail(20):
+                    print(f"[LOGS] {name}: {text}")
+    elif report.when == "call" and report.failed:
         print(f"\n[FAILURE] Test {item.name} failed. Attempting diagnostics...")
         # Check if it looks like a specific service failure based on test name
         if "woodpecker" in item.name.lower():
@@ -35,14 +136,19 @@ def pytest_runtest_makereport(item, call):
 
 import subprocess
 
+from tests.engine import get_engine
+
 def dump_logs(container_name: str, tail: int = 50):
     try:
         print(f"[LOGS] --- {container_name} (last {tail} lines) ---")
-        cmd = ["docker", "logs", "--tail", str(tail), container_name]
-        if os.name != 'nt' and os.geteuid() != 0:
-            cmd.insert(0, "sudo")
-        subprocess.run(cmd, check=False)
+        engine = get_engine()
+        if engine:
+            print(engine.logs(container_name, tail=tail), end="")
+        else:
+            cmd = ["docker", "logs", "--tail", str(tail), container_name]
+            if os.name != 'nt' and os.geteuid() != 0:
+                cmd.insert(0, "sudo")
+            subprocess.run(cmd, check=False)
         print(f"[LOGS] --- End {container_name} ---")
     except Exception:
         pass
-
@@ -0,0 +1,290 @@
+"""
+Minimal client for the Docker-compatible REST API that both Docker and
+Podman serve on their unix socket.
+
+Used by the test helpers for inspect/exec/logs/cp/network queries instead of
+spawning a `podman`/`docker` (often `sudo docker`) process per call and
+parsing its text output. One keep-alive connection is shared per client;
+requests are serialized on it. get_engine() returns None when no socket is
+reachable, and callers fall back to the CLI.
+
+Socket lookup order: CONTAINER_HOST, DOCKER_HOST (unix:// only), rootful and
+rootless Podman sockets, /var/run/docker.sock.
+"""
+import http.client
+import io
+import json
+import os
+import socket
+import struct
+import tarfile
+import threading
+import urllib.parse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Oldest Docker API version Podman's compat layer and current Docker both serve
+API_VERSION = "v1.41"
+SOCKET_CANDIDATES = [
+    "/run/podman/podman.sock",
+    os.path.join(os.environ.get("XDG_RUNTIME_DIR", f"/run/user/{os.getuid() if hasattr(os, 'getuid') else 0}"),
+                 "podman", "podman.sock"),
+    "/var/run/docker.sock",
+]
+
+
+class EngineError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float = 30.0):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def demux(data: bytes) -> Tuple[bytes, bytes]:
+    """Split a non-TTY attach/logs stream into (stdout, stderr).
+
+    Frames are [stream, 0, 0, 0, size (big-endian u32)] + payload. Streams of
+    TTY containers are not framed and are returned as stdout unchanged.
+    """
+    out, err = [], []
+    pos = 0
+    while pos + 8 <= len(data):
+        kind, size = data[pos], struct.unpack(">I", data[pos + 4:pos + 8])[0]
+        if kind not in (0, 1, 2) or data[pos + 1:pos + 4] != b"\x00\x00\x00":
+            return data, b""
+        (err if kind == 2 else out).append(data[pos + 8:pos + 8 + size])
+        pos += 8 + size
+    if pos != len(data):
+        return data, b""
+    return b"".join(out), b"".join(err)
+
+
+def socket_paths() -> List[str]:
+    paths = []
+    for var in ("CONTAINER_HOST", "DOCKER_HOST"):
+        value = os.environ.get(var, "")
+        if value.startswith("unix://"):
+            paths.append(value[len("unix://"):])
+    return paths + SOCKET_CANDIDATES
+
+
+class EngineClient:
+    def __init__(self, socket_path: str, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._conn = UnixHTTPConnection(socket_path, timeout)
+        self._lock = threading.Lock()
+
+    def request(self, method: str, path: str, params: Dict[str, Any] = None, body: Any = None,
+                raw_body: bytes = None, content_type: str = "application/json") -> Tuple[int, bytes]:
+        url = f"/{API_VERSION}{path}"
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        data = raw_body if raw_body is not None else (json.dumps(body).encode("utf-8") if body is not None else None)
+        headers = {"Content-Type": content_type} if data is not None else {}
+        with self._lock:
+            # One retry: the engine may have closed the idle keep-alive connection
+            for attempt in (0, 1):
+                try:
+                    self._conn.request(method, url, body=data, headers=headers)
+                    resp = self._conn.getresponse()
+                    return resp.status, resp.read()
+                except (ConnectionError, http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                        http.client.ResponseNotReady, BrokenPipeError):
+                    self._conn.close()
+                    if attempt:
+                        raise
+
+    def _json(self, method: str, path: str, ok=(200, 201, 204), **kwargs) -> Any:
+        status, data = self.request(method, path, **kwargs)
+        if status not in ok:
+            raise EngineError(status, _message(data))
+        return json.loads(data) if data else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Queries ---
+
+    def ping(self) -> bool:
+        status, _ = self.request("GET", "/_ping")
+        return status == 200
+
+    def inspect(self, container: str) -> Optional[Dict[str, Any]]:
+        status, data = self.request("GET", f"/containers/{_quote(container)}/json")
+        if status == 404:
+            return None
+        if status != 200:
+            raise EngineError(status, _message(data))
+        return json.loads(data)
+
+    def container_ip(self, container: str) -> str:
+        info = self.inspect(container) or {}
+        networks = (info.get("NetworkSettings") or {}).get("Networks") or {}
+        return "".join(n.get("IPAddress") or "" for n in networks.values())
+
+    def containers(self, name: str = None, all: bool = False) -> List[Dict[str, Any]]:
+        params = {"all": "true" if all else "false"}
+        if name:
+            params["filters"] = json.dumps({"name": [name]})
+        return self._json("GET", "/containers/json", params=params)
+
+    def network_gateways(self, network: str) -> List[str]:
+        status, data = self.request("GET", f"/networks/{_quote(network)}")
+        if status == 404:
+            return []
+        if status != 200:
+            raise EngineError(status, _message(data))
+        config = (json.loads(data).get("IPAM") or {}).get("Config") or []
+        return [c["Gateway"] for c in config if c.get("Gateway")]
+
+    # --- Operations ---
+
+    def exec(self, container: str, cmd: List[str], env: Dict[str, str] = None,
+             timeout: float = None) -> Tuple[int, str, str]:
+        """Run `cmd` in a running container; returns (exit code, stdout, stderr).
+
+        The start call only answers once the command exits (`kubectl rollout
+        status --timeout=300s`), so it runs on its own connection with no read
+        timeout unless the caller passes one.
+        """
+        spec = {"Cmd": cmd, "AttachStdout": True, "AttachStderr": True, "Tty": False}
+        if env:
+            spec["Env"] = [f"{k}={v}" for k, v in env.items()]
+        exec_id = self._json("POST", f"/containers/{_quote(container)}/exec", body=spec)["Id"]
+        conn = UnixHTTPConnection(self.socket_path, timeout)
+        try:
+            conn.request("POST", f"/{API_VERSION}/exec/{exec_id}/start",
+                         body=json.dumps({"Detach": False, "Tty": False}).encode("utf-8"),
+                         headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            status, data = resp.status, resp.read()
+        finally:
+            conn.close()
+        if status != 200:
+            raise EngineError(status, _message(data))
+        stdout, stderr = demux(data)
+        exit_code = self._json("GET", f"/exec/{exec_id}/json").get("ExitCode")
+        return (exit_code if exit_code is not None else -1,
+                stdout.decode("utf-8", errors="replace"), stderr.decode("utf-8", errors="replace"))
+
+    def logs(self, container: str, tail: int = 50) -> str:
+        status, data = self.request("GET", f"/containers/{_quote(container)}/logs",
+                                    params={"stdout": 1, "stderr": 1, "tail": tail})
+        if status != 200:
+            raise EngineError(status, _message(data))
+        stdout, stderr = demux(data)
+        # Interleaving between the two streams is lost; stdout first is good enough for diagnostics
+        return (stdout + stderr).decode("utf-8", errors="replace")
+
+    def follow_logs(self, container: str, since: float = 0, timeout: float = None) -> Iterator[Tuple[str, bytes]]:
+        """Yield ("stdout"|"stderr", line) as the container logs, until it stops.
+
+        Lines carry the engine's RFC 3339 timestamp prefix (`timestamps=1`).
+        Uses its own connection: a follow request holds it open indefinitely.
+        """
+        conn = UnixHTTPConnection(self.socket_path, timeout)
+        try:
+            params = {"follow": 1, "stdout": 1, "stderr": 1, "timestamps": 1, "since": int(since)}
+            conn.request("GET", f"/{API_VERSION}/containers/{_quote(container)}/logs?" + urllib.parse.urlencode(params))
+            resp = conn.getresponse()
+            if resp.status != 200:
+                raise EngineError(resp.status, _message(resp.read()))
+            # TTY containers are not framed; they send plain lines
+            framed = (self.inspect(container) or {}).get("Config", {}).get("Tty") is not True
+            pending = {"stdout": b"", "stderr": b""}
+            while True:
+                if framed:
+                    header = resp.read(8)
+                    if len(header) < 8:
+                        break
+                    stream = "stderr" if header[0] == 2 else "stdout"
+                    chunk = resp.read(struct.unpack(">I", header[4:8])[0])
+                else:
+                    stream, chunk = "stdout", resp.readline()
+                    if not chunk:
+                        break
+                lines = (pending[stream] + chunk).split(b"\n")
+                pending[stream] = lines.pop()
+                for line in lines:
+                    yield stream, line
+            for stream, rest in pending.items():
+                if rest:
+                    yield stream, rest
+        finally:
+            conn.close()
+
+    def restart(self, container: str, timeout: int = 10):
+        self._json("POST", f"/containers/{_quote(container)}/restart", params={"t": timeout})
+
+    def read_file(self, container: str, path: str) -> Optional[bytes]:
+        """Contents of a single file in the container (the API's `cp` is a tar archive)."""
+        status, data = self.request("GET", f"/containers/{_quote(container)}/archive", params={"path": path})
+        if status == 404:
+            return None
+        if status != 200:
+            raise EngineError(status, _message(data))
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            member = next((m for m in tar.getmembers() if m.isfile()), None)
+            return tar.extractfile(member).read() if member else None
+
+    def write_file(self, container: str, path: str, content: bytes, mode: int = 0o644):
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w") as tar:
+            info = tarfile.TarInfo(os.path.basename(path))
+            info.size = len(content)
+            info.mode = mode
+            tar.addfile(info, io.BytesIO(content))
+        self._json("PUT", f"/containers/{_quote(container)}/archive", params={"path": os.path.dirname(path) or "/"},
+                   raw_body=buf.getvalue(), content_type="application/x-tar")
+
+
+def _quote(name: str) -> str:
+    return urllib.parse.quote(name, safe="")
+
+
+def _message(data: bytes) -> str:
+    try:
+        return json.loads(data).get("message", "")
+    except ValueError:
+        return data.decode("utf-8", errors="replace")[:200]
+
+
+_ENGINE: Optional[EngineClient] = None
+_ENGINE_PROBED = False
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_engine() -> Optional[EngineClient]:
+    """Shared client for the first socket that answers /_ping, or None (use the CLI)."""
+    global _ENGINE, _ENGINE_PROBED
+    with _ENGINE_LOCK:
+        if _ENGINE_PROBED:
+            return _ENGINE
+        _ENGINE_PROBED = True
+        if os.environ.get("E2E_ENGINE_API", "").lower() in ("off", "0", "false") or not hasattr(socket, "AF_UNIX"):
+            return None
+        for path in socket_paths():
+            if not os.path.exists(path):
+                continue
+            client = EngineClient(path)
+            try:
+                if client.ping():
+                    _ENGINE = client
+                    return client
+            except OSError:
+                # Typically EACCES on a root-owned socket: the CLI fallback will use sudo
+                pass
+            client.close()
+        return None
@@ -0,0 +1,180 @@
+"""
+Platform health daemon: runs checks on their own schedules and serves the
+cached results over HTTP/JSON.
+
+Each check runs on a worker pool at its own interval (a registry probe every
+15s, the OAuth config every 5 minutes), never overlapping with itself. The
+latest result, its timestamp and duration are cached, so a query costs a
+dictionary lookup instead of re-probing the platform.
+
+    GET /health               all checks; 200 if every critical check passes, else 503
+    GET /health/<name>        one check (404 if unknown)
+    GET /health?refresh=1     run the check(s) now and wait for the result
+
+tests/smoke.py wires HealthChecker into it: `python tests/smoke.py --daemon`.
+"""
+import heapq
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_PORT = 8765
+# A result older than this many intervals is reported as stale
+STALE_AFTER_INTERVALS = 3
+
+CheckFn = Callable[[], Tuple[bool, List[str], List[str]]]
+
+
+class Check:
+    def __init__(self, name: str, fn: CheckFn, interval: float, critical: bool = True):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        # Non-critical checks (warnings in smoke.py) degrade the status instead of failing it
+        self.critical = critical
+
+
+class HealthDaemon:
+    def __init__(self, checks: Sequence[Check], max_workers: int = 4):
+        self.checks = {c.name: c for c in checks}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="health")
+        self._running: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._scheduler: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # --- Checks ---
+
+    def _run(self, check: Check, done: threading.Event):
+        started = time.time()
+        try:
+            ok, errors, warnings = check.fn()
+        except Exception as e:
+            ok, errors, warnings = False, [f"{type(e).__name__}: {e}"], []
+        finished = time.time()
+        with self._lock:
+            self.results[check.name] = {
+                "ok": bool(ok), "critical": check.critical, "errors": list(errors), "warnings": list(warnings),
+                "checked_at": finished, "duration": finished - started, "interval": check.interval,
+            }
+            self._running.pop(check.name, None)
+        done.set()
+
+    def submit(self, name: str) -> threading.Event:
+        """Start `name` unless it is already running; returns an event set when it finishes."""
+        with self._lock:
+            done = self._running.get(name)
+            if done is None:
+                done = self._running[name] = threading.Event()
+                self._pool.submit(self._run, self.checks[name], done)
+        return done
+
+    def run_now(self, names: Optional[Sequence[str]] = None, timeout: float = 30.0):
+        events = [self.submit(n) for n in (names or self.checks)]
+        deadline = time.time() + timeout
+        for e in events:
+            e.wait(max(0.0, deadline - time.time()))
+
+    def _schedule(self):
+        if not self.checks:
+            return
+        now = time.time()
+        # Everything runs once at startup, then each check on its own interval
+        queue = [(now, name) for name in self.checks]
+        heapq.heapify(queue)
+        while not self._stop.is_set():
+            due, name = queue[0]
+            delay = due - time.time()
+            if delay > 0:
+                self._stop.wait(delay)
+                continue
+            heapq.heapreplace(queue, (max(due + self.checks[name].interval, time.time()), name))
+            self.submit(name)
+
+    # --- Results ---
+
+    def snapshot(self, names: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            results = {n: dict(self.results[n]) for n in (names or self.checks) if n in self.results}
+        for r in results.values():
+            r["age"] = now - r["checked_at"]
+            r["stale"] = r["age"] > STALE_AFTER_INTERVALS * r["interval"]
+        pending = [n for n in (names or self.checks) if n not in results]
+        if any(not r["ok"] and r["critical"] for r in results.values()):
+            status = "down"
+        elif pending or any(not r["ok"] or r["stale"] for r in results.values()):
+            status = "degraded"
+        else:
+            status = "ok"
+        return {"status": status, "generated_at": now, "pending": pending, "checks": results}
+
+    # --- Lifecycle ---
+
+    def start(self) -> "HealthDaemon":
+        self._scheduler = threading.Thread(target=self._schedule, name="health-scheduler", daemon=True)
+        self._scheduler.start()
+        return self
+
+    def serve(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                parts = [p for p in url.path.split("/") if p]
+                if not parts or parts[0] != "health" or len(parts) > 2:
+                    return self._reply(404, {"error": "not found"})
+                names = parts[1:] or None
+                if names and names[0] not in daemon.checks:
+                    return self._reply(404, {"error": f"unknown check {names[0]}", "checks": sorted(daemon.checks)})
+                if urllib.parse.parse_qs(url.query).get("refresh") == ["1"]:
+                    daemon.run_now(names)
+                body = daemon.snapshot(names)
+                self._reply(503 if body["status"] == "down" else 200, body)
+
+            def _reply(self, status: int, body: Dict[str, Any]):
+                data = json.dumps(body, indent=2).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="health-http", daemon=True).start()
+        return self._server
+
+    def stop(self):
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        self._pool.shutdown(wait=False)
+
+
+def query(url: str = f"http://127.0.0.1:{DEFAULT_PORT}/health", timeout: float = 0.5) -> Optional[Dict[str, Any]]:
+    """Cached status from a running daemon, or None if none is listening."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        # 503 still carries the full status
+        try:
+            return json.loads(e.read())
+        except ValueError:
+            return None
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,157 @@
+"""
+Background capture of platform container logs for failure diagnostics.
+
+One daemon thread per container follows its log (engine API, or
+`docker logs -f` without a socket) into a bounded ring buffer of
+(timestamp, stream, line). When a test fails, write_bundle() copies the
+slice of every buffer around the test's time window to disk at once,
+instead of running `docker logs --tail` per container after the fact.
+"""
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from tests.engine import get_engine
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DIAGNOSTICS_DIR = os.path.join(REPO_ROOT, "diagnostics")
+PLATFORM_CONTAINERS = ["gitea", "woodpecker-server", "woodpecker-agent", "platform-bootstrap"]
+# Lines kept per container; roughly a few MB across the platform
+BUFFER_LINES = 20000
+RECONNECT_SEC = 5.0
+
+TIMESTAMP = re.compile(r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(\.\d+)?(Z|[+-]\d{2}:\d{2})? ?")
+
+Entry = Tuple[float, str, str]
+
+
+def split_timestamp(line: str, default: float) -> Tuple[float, str]:
+    """Strip the engine's `--timestamps` prefix; fall back to the receive time."""
+    m = TIMESTAMP.match(line)
+    if not m:
+        return default, line
+    # RFC 3339 nanoseconds -> the six digits fromisoformat() accepts
+    frac = "." + (m.group(2) or ".")[1:7].ljust(6, "0")
+    zone = m.group(3) or "Z"
+    try:
+        ts = datetime.fromisoformat(m.group(1) + frac + ("+00:00" if zone == "Z" else zone)).timestamp()
+    except ValueError:
+        return default, line
+    return ts, line[m.end():]
+
+
+class LogBuffer:
+    def __init__(self, capacity: int = BUFFER_LINES):
+        self._lines: Deque[Entry] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def append(self, ts: float, stream: str, text: str):
+        with self._lock:
+            self._lines.append((ts, stream, text))
+
+    def slice(self, start: float, end: float) -> List[Entry]:
+        with self._lock:
+            return [e for e in self._lines if start <= e[0] <= end]
+
+    def tail(self, n: int) -> List[Entry]:
+        with self._lock:
+            return list(self._lines)[-n:]
+
+
+class LogCollector:
+    def __init__(self, containers: Sequence[str], capacity: int = BUFFER_LINES):
+        self.containers = list(containers)
+        self.buffers: Dict[str, LogBuffer] = {c: LogBuffer(capacity) for c in self.containers}
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._procs: Dict[str, subprocess.Popen] = {}
+        self._engine = get_engine()
+        self._cli = None if self._engine else shutil.which("docker") or shutil.which("podman")
+
+    @property
+    def available(self) -> bool:
+        return bool(self._engine or self._cli)
+
+    def start(self) -> "LogCollector":
+        started = time.time()
+        for name in self.containers:
+            t = threading.Thread(target=self._follow, args=(name, started), name=f"logs-{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for proc in list(self._procs.values()):
+            proc.terminate()
+
+    def _follow(self, name: str, started: float):
+        buf = self.buffers[name]
+        # Backfill a minute so a failure early in the session still has context
+        since = started - 60
+        last_seen, seen_at_last = 0.0, set()
+        while not self._stop.is_set():
+            try:
+                for stream, text in self._stream(name, since):
+                    ts, text = split_timestamp(text, time.time())
+                    # `since` has one-second resolution: skip what the previous connection already delivered
+                    if ts < last_seen or (ts == last_seen and text in seen_at_last):
+                        continue
+                    if ts > last_seen:
+                        last_seen, seen_at_last = ts, set()
+                    seen_at_last.add(text)
+                    buf.append(ts, stream, text)
+                    since = ts
+                    if self._stop.is_set():
+                        return
+            except Exception:
+                # Container missing or restarting (woodpecker-server is restarted during setup)
+                pass
+            self._stop.wait(RECONNECT_SEC)
+
+    def _stream(self, name: str, since: float):
+        if self._engine:
+            for stream, line in self._engine.follow_logs(name, since=since):
+                yield stream, line.decode("utf-8", errors="replace").rstrip("\r")
+            return
+        cmd = [self._cli, "logs", "-f", "--timestamps", "--since", str(int(since)), name]
+        if os.name != "nt" and os.geteuid() != 0 and os.path.basename(self._cli) == "docker":
+            # -n: a background thread must never sit on a password prompt
+            cmd[:0] = ["sudo", "-n"]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace")
+        self._procs[name] = proc
+        try:
+            for line in proc.stdout:
+                yield "stdout", line.rstrip("\r\n")
+        finally:
+            proc.kill()
+            self._procs.pop(name, None)
+
+    def write_bundle(self, test: str, start: float, end: float, margin: float = 15.0,
+                     report: Optional[str] = None, directory: Optional[str] = None) -> str:
+        """Dump every container's lines from [start - margin, end + margin] plus a summary."""
+        safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", test)[-80:]
+        path = os.path.join(directory or os.environ.get("E2E_DIAGNOSTICS_DIR", DIAGNOSTICS_DIR),
+                            f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(end))}-{safe}")
+        os.makedirs(path, exist_ok=True)
+        counts = {}
+        for name, buf in self.buffers.items():
+            entries = buf.slice(start - margin, end + margin)
+            counts[name] = len(entries)
+            with open(os.path.join(path, f"{name}.log"), "w", encoding="utf-8") as f:
+                for ts, stream, text in entries:
+                    stamp = datetime.fromtimestamp(ts).strftime("%H:%M:%S.%f")[:-3]
+                    f.write(f"{stamp} {'E' if stream == 'stderr' else ' '} {text}\n")
+        with open(os.path.join(path, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump({"test": test, "start": start, "end": end, "margin": margin, "lines": counts}, f, indent=2)
+        if report:
+            with open(os.path.join(path, "failure.txt"), "w", encoding="utf-8") as f:
+                f.write(report)
+        return path
@@ -0,0 +1,232 @@
+"""
+YAML-aware patching of GitOps manifests.
+
+Each file is composed once with PyYAML; the node tree gives the exact source
+span of every scalar, so only the targeted values are rewritten and the rest
+of the file (comments, indentation, key order) stays byte-for-byte identical.
+
+Usage:
+  python tests/manifests.py \
+      --image hello-api=registry.localhost:5002/hello-api:abc123 \
+      --config hello-api-model.MODEL_OBJECT=ml-models/iris-abc123.joblib \
+      --config hello-api-model.MODEL_SHA=0f3c... \
+      gitops/apps/hello/deployment.yaml gitops/apps/hello/model-configmap.yaml
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import yaml
+from yaml.nodes import MappingNode, Node, ScalarNode, SequenceNode
+
+# Where the pod template lives for each workload kind
+POD_SPEC_PATHS = {
+    "Pod": ("spec",),
+    "Deployment": ("spec", "template", "spec"),
+    "StatefulSet": ("spec", "template", "spec"),
+    "DaemonSet": ("spec", "template", "spec"),
+    "ReplicaSet": ("spec", "template", "spec"),
+    "Job": ("spec", "template", "spec"),
+    "CronJob": ("spec", "jobTemplate", "spec", "template", "spec"),
+}
+
+
+class ManifestPatchError(Exception):
+    pass
+
+
+def _get(node: Optional[Node], key: str) -> Optional[Node]:
+    if not isinstance(node, MappingNode):
+        return None
+    for k, v in node.value:
+        if isinstance(k, ScalarNode) and k.value == key:
+            return v
+    return None
+
+def _get_path(node: Optional[Node], path: Sequence[str]) -> Optional[Node]:
+    for key in path:
+        node = _get(node, key)
+    return node
+
+def _scalar(node: Optional[Node], key: str) -> Optional[str]:
+    value = _get(node, key)
+    return value.value if isinstance(value, ScalarNode) else None
+
+def _render(node: ScalarNode, value: str) -> str:
+    """Render `value` so it reads back as the same string, keeping the original quoting style."""
+    if node.style in ("|", ">"):
+        raise ManifestPatchError(f"Block scalars are not supported (line {node.start_mark.line + 1})")
+    if node.style == "'":
+        return "'" + value.replace("'", "''") + "'"
+    if node.style == '"' or not _is_plain_string(value):
+        # JSON strings are valid double-quoted YAML scalars
+        return json.dumps(value)
+    return value
+
+def _is_plain_string(value: str) -> bool:
+    """True if `value` can be written unquoted and still load back as the same string."""
+    if "\n" in value:
+        return False
+    try:
+        return yaml.safe_load(value) == value
+    except yaml.YAMLError:
+        return False
+
+
+class Manifest:
+    """One YAML file (possibly multi-document) with pending scalar edits."""
+
+    def __init__(self, text: str, path: str = "<string>"):
+        self.text = text
+        self.path = path
+        try:
+            self.documents = [d for d in yaml.compose_all(text) if d is not None]
+        except yaml.YAMLError as e:
+            raise ManifestPatchError(f"{path}: {e}")
+        self._edits: Dict[int, Tuple[int, str]] = {}
+
+    def _set(self, node: Node, value: str) -> bool:
+        if not isinstance(node, ScalarNode):
+            raise ManifestPatchError(f"{self.path}: expected a scalar at line {node.start_mark.line + 1}")
+        if node.value == value:
+            return False
+        self._edits[node.start_mark.index] = (node.end_mark.index, _render(node, value))
+        return True
+
+    def resources(self) -> Iterator[Tuple[str, str, MappingNode]]:
+        for doc in self.documents:
+            yield _scalar(doc, "kind") or "", _scalar(_get(doc, "metadata"), "name") or "", doc
+
+    def set_path(self, kind: str, name: str, path: Sequence[str], value: str) -> bool:
+        """Set a scalar by key path inside the resource `kind`/`name`. Returns True if found."""
+        found = False
+        for doc_kind, doc_name, doc in self.resources():
+            if doc_kind == kind and doc_name == name:
+                node = _get_path(doc, path)
+                if node is not None:
+                    self._set(node, value)
+                    found = True
+        return found
+
+    def set_image(self, container: str, image: str, init_containers: bool = False) -> bool:
+        """Set the image of every container named `container` in any workload.
+
+        initContainers are left alone unless explicitly requested.
+        """
+        lists = ("containers", "initContainers") if init_containers else ("containers",)
+        found = False
+        for kind, _, doc in self.resources():
+            if kind not in POD_SPEC_PATHS:
+                continue
+            pod_spec = _get_path(doc, POD_SPEC_PATHS[kind])
+            for list_key in lists:
+                items = _get(pod_spec, list_key)
+                if not isinstance(items, SequenceNode):
+                    continue
+                for item in items.value:
+                    if _scalar(item, "name") == container and _get(item, "image") is not None:
+                        self._set(_get(item, "image"), image)
+                        found = True
+        return found
+
+    def set_config(self, configmap: str, key: str, value: str) -> bool:
+        return self.set_path("ConfigMap", configmap, ("data", key), value)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self._edits)
+
+    def render(self) -> str:
+        out = self.text
+        for start in sorted(self._edits, reverse=True):
+            end, replacement = self._edits[start]
+            out = out[:start] + replacement + out[end:]
+        return out
+
+
+def patch_manifest(text: str, images: Optional[Dict[str, str]] = None,
+                   config: Optional[Dict[str, Dict[str, str]]] = None, strict: bool = True) -> str:
+    """Patch a single manifest text. With `strict`, every requested target must exist."""
+    manifest = Manifest(text)
+    missing = _apply(manifest, images or {}, config or {})
+    if strict and missing:
+        raise ManifestPatchError(f"Targets not found: {', '.join(missing)}")
+    return manifest.render()
+
+def patch_files(paths: Sequence[str], images: Optional[Dict[str, str]] = None,
+                config: Optional[Dict[str, Dict[str, str]]] = None, write: bool = True) -> List[str]:
+    """Patch many manifest files in one pass and return the paths that changed.
+
+    Raises ManifestPatchError if a requested image or config key was found in none of the files.
+    """
+    images = images or {}
+    config = config or {}
+    manifests = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            manifests.append(Manifest(f.read(), path))
+
+    missing_everywhere = None
+    for manifest in manifests:
+        missing = set(_apply(manifest, images, config))
+        missing_everywhere = missing if missing_everywhere is None else missing_everywhere & missing
+    if missing_everywhere:
+        raise ManifestPatchError(f"Targets not found in any manifest: {', '.join(sorted(missing_everywhere))}")
+
+    changed = [m.path for m in manifests if m.changed]
+    if write:
+        for manifest in manifests:
+            if manifest.changed:
+                with open(manifest.path, "w", encoding="utf-8", newline="") as f:
+                    f.write(manifest.render())
+    return changed
+
+def _apply(manifest: Manifest, images: Dict[str, str], config: Dict[str, Dict[str, str]]) -> List[str]:
+    missing = []
+    for container, image in images.items():
+        if not manifest.set_image(container, image):
+            missing.append(f"image:{container}")
+    for configmap, values in config.items():
+        for key, value in values.items():
+            if not manifest.set_config(configmap, key, value):
+                missing.append(f"config:{configmap}.{key}")
+    return missing
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Patch container images and ConfigMap keys in Kubernetes manifests.")
+    parser.add_argument("--image", action="append", default=[], metavar="CONTAINER=IMAGE")
+    parser.add_argument("--config", action="append", default=[], metavar="CONFIGMAP.KEY=VALUE")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("paths", nargs="+")
+    args = parser.parse_args(argv)
+
+    images: Dict[str, str] = {}
+    for item in args.image:
+        container, sep, image = item.partition("=")
+        if not (sep and container and image):
+            parser.error(f"--image {item!r}: expected CONTAINER=IMAGE")
+        images[container] = image
+    config: Dict[str, Dict[str, str]] = {}
+    for item in args.config:
+        target, sep, value = item.partition("=")
+        configmap, dot, key = target.partition(".")
+        if not (sep and dot and configmap and key):
+            parser.error(f"--config {item!r}: expected CONFIGMAP.KEY=VALUE")
+        config.setdefault(configmap, {})[key] = value
+
+    try:
+        changed = patch_files(args.paths, images, config, write=not args.dry_run)
+    except ManifestPatchError as e:
+        print(f"[manifests] {e}", file=sys.stderr)
+        return 1
+    for path in changed:
+        print(f"[manifests] patched {path}")
+    if not changed:
+        print("[manifests] nothing to change")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+On-disk cache of idempotent e2e setup: Woodpecker tokens, repo activation,
+CI secrets, MinIO buckets.
+
+Entries are trusted only while the environment fingerprint matches and the
+caller's cheap check (usually one authenticated GET) passes, so the slow
+paths (Playwright login, Woodpecker DB upsert and restart) only run when the
+platform was reset or a token expired. Set E2E_SETUP_CACHE=off to bypass it.
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_PATH = os.path.join(REPO_ROOT, ".e2e-setup-cache.json")
+# Tokens expiring sooner than this are treated as already expired
+EXPIRY_MARGIN_SEC = 300
+
+
+def fingerprint(*parts: Any) -> str:
+    """Hash of whatever identifies the platform instance (URLs, user, bootstrap token)."""
+    return hashlib.sha256(json.dumps([str(p) for p in parts]).encode("utf-8")).hexdigest()
+
+
+def jwt_expiry(token: str) -> Optional[float]:
+    """`exp` claim of a JWT without verifying it; None if absent or not a JWT."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"]) if "exp" in claims else None
+    except (IndexError, ValueError, TypeError):
+        return None
+
+
+class SetupCache:
+    def __init__(self, env_fingerprint: str, path: Optional[str] = None):
+        setting = os.environ.get("E2E_SETUP_CACHE", "")
+        self.enabled = setting.lower() not in ("off", "0", "false")
+        self.path = path or (setting if self.enabled and setting not in ("", "on", "1", "true") else DEFAULT_PATH)
+        self.fingerprint = env_fingerprint
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if self.enabled and os.path.isfile(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("fingerprint") == env_fingerprint:
+                    self._entries = data.get("entries", {})
+                else:
+                    print("[cache] Environment changed since last run, ignoring setup cache")
+            except (OSError, ValueError) as e:
+                print(f"[cache] Unreadable setup cache {self.path}: {e}")
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+        if not entry:
+            return None
+        expires_at = entry.get("expires_at")
+        if expires_at is not None and expires_at - EXPIRY_MARGIN_SEC < time.time():
+            return None
+        return entry["value"]
+
+    def put(self, key: str, value: Any, expires_at: Optional[float] = None):
+        with self._lock:
+            self._entries[key] = {"value": value, "expires_at": expires_at, "created_at": time.time()}
+            self._save()
+
+    def drop(self, key: str):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        if not self.enabled:
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        # Holds tokens: owner-only, written atomically so a crashed run never leaves half a file
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "entries": self._entries}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def ensure(self, key: str, verify: Callable[[Any], bool], create: Callable[[], Any],
+               expires_at: Callable[[Any], Optional[float]] = None) -> Any:
+        """Return the cached value if `verify` accepts it, otherwise `create` and cache a new one."""
+        started = time.time()
+        value = self.get(key)
+        if value is not None:
+            try:
+                if verify(value):
+                    print(f"[cache] {key}: reused ({time.time() - started:.2f}s)")
+                    return value
+                print(f"[cache] {key}: verification failed, provisioning again")
+            except Exception as e:
+                print(f"[cache] {key}: verification error ({e}), provisioning again")
+            self.drop(key)
+        value = create()
+        self.put(key, value, expires_at(value) if expires_at else None)
+        print(f"[cache] {key}: provisioned ({time.time() - started:.2f}s)")
+        return value
@@ -5,6 +5,7 @@ Quick validation of critical infrastructure components
 import os
 import socket
 import subprocess
+import sys
 import time
 from typing import Dict, List, Tuple
 import requests
@@ -13,6 +14,11 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Allow `python tests/smoke.py` to import sibling helpers as `tests.*`
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from tests.engine import get_engine
+from tests.health_daemon import DEFAULT_PORT, Check, HealthDaemon, query
+
 
 class HealthChecker:
     """Platform health validation"""
@@ -26,19 +32,27 @@ class HealthChecker:
     def check_network_gateway(self) -> bool:
         """Verify k3d network gateway IP matches configuration"""
         try:
-            result = subprocess.run(
-                ["podman", "network", "inspect", "k3d", 
-                 "--format", "{{range .IPAM.Config}}{{.Gateway}}{{end}}"],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            
-            if result.returncode != 0:
-                self.errors.append("k3d network not found")
-                return False
+            engine = get_engine()
+            if engine:
+                gateways = engine.network_gateways("k3d")
+                if not gateways:
+                    self.errors.append("k3d network not found")
+                    return False
+                actual_gateway = "".join(gateways)
+            else:
+                result = subprocess.run(
+                    ["podman", "network", "inspect", "k3d", 
+                     "--format", "{{range .IPAM.Config}}{{.Gateway}}{{end}}"],
+                    capture_output=True,
+                    text=True,
+                    timeout=5
+                )
                 
-            actual_gateway = result.stdout.strip()
+                if result.returncode != 0:
+                    self.errors.append("k3d network not found")
+                    return False
+                    
+                actual_gateway = result.stdout.strip()
             
             if actual_gateway != self.gateway_ip:
                 self.errors.append(
@@ -130,15 +144,20 @@ class HealthChecker:
     def check_k3d_cluster(self) -> bool:
         """Verify k3d cluster is running"""
         try:
-            result = subprocess.run(
-                ["podman", "ps", "--filter", "name=k3d-gitopslab-server", 
-                 "--format", "{{.Names}}"],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
+            engine = get_engine()
+            if engine:
+                names = " ".join(n for c in engine.containers(name="k3d-gitopslab-server") for n in c.get("Names", []))
+            else:
+                result = subprocess.run(
+                    ["podman", "ps", "--filter", "name=k3d-gitopslab-server", 
+                     "--format", "{{.Names}}"],
+                    capture_output=True,
+                    text=True,
+                    timeout=5
+                )
+                names = result.stdout
             
-            if "k3d-gitopslab-server" not in result.stdout:
+            if "k3d-gitopslab-server" not in names:
                 self.errors.append("k3d cluster not running")
                 return False
                 
@@ -151,19 +170,24 @@ class HealthChecker:
     def check_argocd(self) -> bool:
         """Verify ArgoCD is deployed"""
         try:
-            result = subprocess.run(
-                ["podman", "exec", "k3d-gitopslab-server-0",
-                 "kubectl", "get", "pods", "-n", "argocd", "--no-headers"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            cmd = ["kubectl", "get", "pods", "-n", "argocd", "--no-headers"]
+            engine = get_engine()
+            if engine:
+                returncode, stdout, _ = engine.exec("k3d-gitopslab-server-0", cmd)
+            else:
+                result = subprocess.run(
+                    ["podman", "exec", "k3d-gitopslab-server-0"] + cmd,
+                    capture_output=True,
+                    text=True,
+                    timeout=10
+                )
+                returncode, stdout = result.returncode, result.stdout
             
-            if result.returncode != 0:
+            if returncode != 0:
                 self.warnings.append("ArgoCD namespace not accessible")
                 return False
                 
-            pod_count = len(result.stdout.strip().split('\n'))
+            pod_count = len(stdout.strip().split('\n'))
             
             if pod_count < 5:
                 self.warnings.append(f"ArgoCD may not be fully deployed ({pod_count} pods)")
@@ -199,10 +223,39 @@ class HealthChecker:
         )
 
 
+# check name -> (HealthChecker method, interval in seconds, critical)
+CHECK_SCHEDULE = {
+    "network_gateway": ("check_network_gateway", 60, True),
+    "docker_api": ("check_docker_api", 15, True),
+    "registry": ("check_registry", 15, True),
+    "gitea": ("check_gitea", 10, True),
+    "woodpecker": ("check_woodpecker", 10, False),
+    "oauth_config": ("check_oauth_config", 300, True),
+    "k3d_cluster": ("check_k3d_cluster", 30, True),
+    "argocd": ("check_argocd", 60, False),
+}
+
+
+def health_checks() -> List[Check]:
+    """HealthChecker methods as daemon checks; each run gets its own checker so errors don't mix."""
+    def make(method: str):
+        def run():
+            checker = HealthChecker()
+            ok = getattr(checker, method)()
+            return ok, checker.errors, checker.warnings
+        return run
+    return [Check(name, make(method), interval, critical)
+            for name, (method, interval, critical) in CHECK_SCHEDULE.items()]
+
+
 # ============================================================================
 # PYTEST TESTS
 # ============================================================================
 
+# Capture platform logs in the background so failures get a diagnostics bundle
+pytestmark = pytest.mark.usefixtures("platform_logs")
+
+
 @pytest.fixture(scope="module")
 def health_checker():
     """Create health checker instance"""
@@ -261,13 +314,46 @@ def test_argocd(health_checker):
 # STANDALONE EXECUTION
 # ============================================================================
 
+def run_daemon(port: int):
+    daemon = HealthDaemon(health_checks()).start()
+    daemon.serve(port=port)
+    print(f"Health daemon on http://127.0.0.1:{port}/health (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        daemon.stop()
+
+
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="GitOps Lab platform smoke tests")
+    parser.add_argument("--daemon", action="store_true", help="Keep re-running the checks and serve them over HTTP")
+    parser.add_argument("--status", action="store_true", help="Print the running daemon's cached results")
+    parser.add_argument("--port", type=int, default=int(os.getenv("HEALTH_DAEMON_PORT", DEFAULT_PORT)))
+    args = parser.parse_args()
+    if args.daemon:
+        run_daemon(args.port)
+        exit(0)
+
     print("=" * 60)
     print("GitOps Lab Platform - Smoke Tests")
     print("=" * 60)
     
-    checker = HealthChecker()
-    results = checker.run_all_checks()
+    cached = query(f"http://127.0.0.1:{args.port}/health") if args.status else None
+    if cached is not None:
+        print(f"(cached by the health daemon, status: {cached['status']})")
+        checker = HealthChecker()
+        results = {}
+        for name, r in cached["checks"].items():
+            results[name] = r["ok"]
+            (checker.errors if r["critical"] else checker.warnings).extend(r["errors"])
+            checker.warnings.extend(r["warnings"])
+    else:
+        if args.status:
+            print("(no health daemon running, checking directly)")
+        checker = HealthChecker()
+        results = checker.run_all_checks()
     
     print("\nResults:")
     print("-" * 60)
@@ -0,0 +1,213 @@
+"""
+Dependency-aware stage runner for the e2e flow.
+
+Stages declare the stages they depend on; everything whose dependencies are
+satisfied runs concurrently on a thread pool. Each stage receives the shared
+context dict and may return a dict of outputs that is merged back into it.
+
+With a Checkpoint, the outputs of every completed stage are persisted. On
+resume, a stage with a `verify` probe is skipped and its saved outputs are
+reused if all its dependencies were reused or are stateless (no probe) and
+the probe still accepts the outputs (the commit exists, the image is in the
+registry, ...). Anything downstream of a stage that re-ran runs again.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from tests.tracing import span
+
+StageFn = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+VerifyFn = Callable[[Dict[str, Any], Dict[str, Any]], bool]
+
+
+class Stage:
+    def __init__(self, name: str, fn: StageFn, deps: Sequence[str] = (), verify: Optional[VerifyFn] = None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        # verify(ctx, saved_outputs) -> still valid; stages without it always run
+        self.verify = verify
+        self.reused = False
+        self.status = "pending"
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def duration(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+class Checkpoint:
+    """Outputs of completed stages, kept in a JSON file between runs."""
+
+    def __init__(self, path: str, env_fingerprint: str = ""):
+        self.path = path
+        self.fingerprint = env_fingerprint
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        if os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("fingerprint") == env_fingerprint:
+                    self.stages = data.get("stages", {})
+            except (OSError, ValueError) as e:
+                print(f"[stage] Unreadable checkpoint {path}: {e}")
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self.stages.get(name)
+        return None if entry is None else entry["outputs"]
+
+    def put(self, name: str, outputs: Optional[Dict[str, Any]]):
+        with self._lock:
+            self.stages[name] = {"outputs": outputs or {}, "completed_at": time.time()}
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self.stages = {}
+            self._save()
+
+    def _save(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        # Outputs may carry tokens (Woodpecker headers): owner-only, replaced atomically
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "stages": self.stages}, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+class StageRunner:
+    def __init__(self, stages: List[Stage], max_workers: int = 4, checkpoint: Optional[Checkpoint] = None,
+                 resume: bool = False):
+        self.stages = {s.name: s for s in stages}
+        self.max_workers = max_workers
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self.t0: Optional[float] = None
+        self._lock = threading.Lock()
+        for s in stages:
+            missing = [d for d in s.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {s.name} depends on unknown stages: {missing}")
+
+    def _try_reuse(self, stage: Stage, ctx: Dict[str, Any]) -> bool:
+        if not (self.resume and self.checkpoint and stage.verify):
+            return False
+        saved = self.checkpoint.get(stage.name)
+        if saved is None:
+            return False
+        if any(self.stages[d].verify and not self.stages[d].reused for d in stage.deps):
+            return False
+        try:
+            with self._lock:
+                view = {**ctx, **saved}
+            if not stage.verify(view, saved):
+                print(f"[stage] {stage.name}: checkpoint no longer valid, running it again")
+                return False
+        except Exception as e:
+            print(f"[stage] {stage.name}: checkpoint probe failed ({e}), running it again")
+            return False
+        with self._lock:
+            ctx.update(saved)
+        return True
+
+    def _run_stage(self, stage: Stage, ctx: Dict[str, Any]):
+        with span(stage.name, "stage", deps=",".join(stage.deps)) as sp:
+            self._run_stage_traced(stage, ctx)
+            sp.set(status="reused" if stage.reused else stage.status)
+
+    def _run_stage_traced(self, stage: Stage, ctx: Dict[str, Any]):
+        stage.started = time.time()
+        if self._try_reuse(stage, ctx):
+            stage.reused = True
+            stage.status = "ok"
+            stage.finished = time.time()
+            print(f"[stage] === {stage.name} reused from checkpoint ({stage.duration:.1f}s to verify)")
+            return
+        print(f"[stage] >>> {stage.name}")
+        try:
+            out = stage.fn(ctx)
+            if out:
+                with self._lock:
+                    ctx.update(out)
+            stage.status = "ok"
+            if self.checkpoint:
+                self.checkpoint.put(stage.name, out)
+        except BaseException as e:
+            stage.status = "failed"
+            stage.error = e
+            raise
+        finally:
+            stage.finished = time.time()
+            print(f"[stage] <<< {stage.name} {stage.status} in {stage.duration:.1f}s")
+
+    def run(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        self.t0 = time.time()
+        if self.checkpoint and not self.resume:
+            self.checkpoint.clear()
+        running = {}
+        failed: Optional[Stage] = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                if failed is None:
+                    for s in self.stages.values():
+                        if s.status == "pending" and all(self.stages[d].status == "ok" for d in s.deps):
+                            s.status = "running"
+                            running[pool.submit(self._run_stage, s, ctx)] = s
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    stage = running.pop(fut)
+                    if fut.exception() is not None and failed is None:
+                        failed = stage
+
+        for s in self.stages.values():
+            if s.status == "pending":
+                s.status = "skipped"
+
+        self.print_summary()
+        if failed is not None:
+            raise failed.error
+        return ctx
+
+    def critical_path(self, target: Optional[str] = None) -> List[Stage]:
+        """Walk back from `target` (default: the last finished stage) through its latest-finishing dependency."""
+        finished = [s for s in self.stages.values() if s.finished is not None]
+        if target is not None:
+            finished = [s for s in finished if s.name == target]
+        if not finished:
+            return []
+        path = [max(finished, key=lambda s: s.finished)]
+        while True:
+            deps = [self.stages[d] for d in path[-1].deps if self.stages[d].finished is not None]
+            if not deps:
+                break
+            path.append(max(deps, key=lambda s: s.finished))
+        return list(reversed(path))
+
+    def print_summary(self):
+        print("\n[stage] Stage timings:")
+        print(f"  {'stage':24s} {'status':8s} {'start':>8s} {'duration':>9s}")
+        ordered = sorted(self.stages.values(), key=lambda s: (s.started is None, s.started or 0))
+        for s in ordered:
+            start = f"{s.started - self.t0:7.1f}s" if s.started is not None else "       -"
+            status = "reused" if s.reused else s.status
+            print(f"  {s.name:24s} {status:8s} {start} {s.duration:8.1f}s")
+
+        path = self.critical_path()
+        if path:
+            total = path[-1].finished - self.t0
+            print(f"[stage] Critical path ({total:.1f}s): " + " -> ".join(f"{s.name} ({s.duration:.1f}s)" for s in path))
+        if self.t0 is not None:
+            print(f"[stage] Wall clock: {time.time() - self.t0:.1f}s, sum of stages: {sum(s.duration for s in self.stages.values()):.1f}s")
@@ -0,0 +1,34 @@
+import pytest
+from tests.argocd import ArgoCDSyncError, push_event, wait_for_app
+
+
+def fake_kubectl(statuses):
+    calls = []
+
+    def kubectl(command):
+        calls.append(command)
+        return statuses[min(len(calls) - 1, len(statuses) - 1)]
+    return kubectl
+
+
+def test_push_event_uses_application_repo_url():
+    event = push_event("http://gitea:3000/gitops/platform.git", "abc", ["gitops/apps/hello/deployment.yaml"])
+    assert event["repository"]["html_url"] == "http://gitea:3000/gitops/platform"
+    assert event["ref"] == "refs/heads/main"
+    assert event["commits"][0]["modified"] == ["gitops/apps/hello/deployment.yaml"]
+
+
+def test_wait_for_app_until_synced_at_revision():
+    kubectl = fake_kubectl([
+        "'Synced|old|Healthy|Succeeded'",
+        "'OutOfSync|new|Healthy|Running'",
+        "'Synced|new|Progressing|Succeeded'",
+        "'Synced|new|Healthy|Succeeded'",
+    ])
+    assert wait_for_app("hello-api", kubectl, revision="new", interval=0)["health"] == "Healthy"
+
+
+def test_wait_for_app_fails_fast_on_failed_sync():
+    kubectl = fake_kubectl(["'OutOfSync|new|Degraded|Failed'"])
+    with pytest.raises(ArgoCDSyncError):
+        wait_for_app("hello-api", kubectl, revision="new", interval=0, timeout=5)
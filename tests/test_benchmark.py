@@ -0,0 +1,61 @@
+import json
+import time
+
+from tests.benchmark import Timeline, run_record, summarize, write_report
+from tests.stages import Stage, StageRunner
+
+
+def fake_run(index, timeline, fail=False):
+    def commit(ctx):
+        ctx["timeline"].mark("commit")
+
+    def build(ctx):
+        # Finish after the `train` sibling so every run has the same critical path
+        time.sleep(0.05)
+        ctx["timeline"].span("wp:build", 100.0, 112.0)
+
+    def serve(ctx):
+        if fail:
+            raise RuntimeError("hello-api still serving the old model")
+        ctx["timeline"].mark("serving")
+
+    runner = StageRunner([
+        Stage("commit-marker", commit),
+        Stage("build-image", build, deps=["commit-marker"]),
+        Stage("train", lambda ctx: None, deps=["commit-marker"]),
+        Stage("serving", serve, deps=["build-image", "train"]),
+        Stage("pipeline-result", lambda ctx: None, deps=["commit-marker"]),
+    ])
+    error = None
+    try:
+        runner.run({"timeline": timeline})
+    except RuntimeError as e:
+        error = e
+    return run_record(index, runner, timeline, target="serving", error=error)
+
+
+def test_run_record_measures_commit_to_serving():
+    record = fake_run(1, Timeline())
+    assert record["ok"]
+    assert record["commit_to_serving"] >= 0
+    assert record["critical_path"][0] == "commit-marker" and record["critical_path"][-1] == "serving"
+    assert record["spans"]["wp:build"]["duration"] == 12.0
+
+
+def test_timeline_keeps_first_mark():
+    timeline = Timeline()
+    timeline.mark("serving", 10.0)
+    timeline.mark("serving", 20.0)
+    assert timeline.marks["serving"] == 10.0
+
+
+def test_report_summarizes_successful_runs_and_lists_failures(tmp_path):
+    runs = [fake_run(1, Timeline()), fake_run(2, Timeline()), fake_run(3, Timeline(), fail=True)]
+    summary = write_report(runs, str(tmp_path / "e2e"))
+    assert summary == summarize(runs)
+    assert (summary["runs"], summary["ok"], summary["commit_to_serving"]["n"]) == (3, 2, 2)
+    assert summary["critical_path"]["runs"] == 2
+    assert summary["critical_path"]["stages"] == ["commit-marker", "build-image", "serving"]
+    assert json.loads((tmp_path / "e2e.json").read_text())["runs"][2]["error"].startswith("RuntimeError")
+    markdown = (tmp_path / "e2e.md").read_text()
+    assert "Commit to serving" in markdown and "run 3: RuntimeError" in markdown
@@ -0,0 +1,36 @@
+import subprocess
+
+from tests.utils import build_hello_api_image
+
+
+def fake_engine(tmp_path, present=()):
+    (tmp_path / "requirements.txt").write_text("fastapi\n")
+    calls = []
+
+    def run(cmd, check=True, **kwargs):
+        calls.append(cmd)
+        ok = cmd[1] not in ("image", "pull") or cmd[-1] in present
+        return subprocess.CompletedProcess(cmd, 0 if ok else 1, "", "")
+    return calls, run
+
+
+def test_built_deps_image_is_pushed_only_when_asked(tmp_path):
+    calls, run = fake_engine(tmp_path)
+    timings = build_hello_api_image("registry.localhost:5002/hello-api:abc", str(tmp_path), run=run, push_deps=True)
+    deps = timings["deps_image"]
+    assert timings["deps_status"] == "built" and deps.startswith("registry.localhost:5002/hello-api-deps:")
+    assert ["podman", "pull", "--tls-verify=false", deps] in calls
+    assert ["podman", "push", "--tls-verify=false", deps] in calls
+
+    calls, run = fake_engine(tmp_path)
+    build_hello_api_image("localhost:5002/hello-api:abc", str(tmp_path), engine="docker", run=run, push_deps=False)
+    assert not any(cmd[1] == "push" for cmd in calls)
+    assert ["docker", "pull", "localhost:5002/hello-api-deps:" + deps.rsplit(":", 1)[1]] in calls
+
+
+def test_cached_deps_image_is_neither_pulled_nor_pushed(tmp_path):
+    calls, run = fake_engine(tmp_path)
+    deps = build_hello_api_image("hello-api:abc", str(tmp_path), run=run)["deps_image"]
+    calls, run = fake_engine(tmp_path, present=[deps])
+    assert build_hello_api_image("hello-api:abc", str(tmp_path), run=run, push_deps=True)["deps_status"] == "cached"
+    assert [cmd[1] for cmd in calls] == ["image", "build"]
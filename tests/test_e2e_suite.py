@@ -43,6 +43,9 @@ def wait_http_any(name: str, urls: Tuple[str, ...], allow_status: Tuple[int, ...
     if last_exc:
         raise last_exc
 
+# Capture platform logs in the background so failures get a diagnostics bundle
+pytestmark = pytest.mark.usefixtures("platform_logs")
+
 # Test Classes
 class TestServiceHealth:
     def test_gitea_reachable(self):
@@ -92,6 +95,8 @@ class TestServiceHealth:
         wait_http_any("Demo app", (f"{url}/", "http://localhost:8088/"))
 
 
+# Same xdist group as test_e2e_flow.py: both drive the full scenario against the shared cluster
+@pytest.mark.xdist_group("e2e-flow")
 class TestE2EScenario:
     def test_run_e2e_script(self):
         """
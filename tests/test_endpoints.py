@@ -0,0 +1,45 @@
+import socket
+
+import pytest
+
+from tests.utils import EndpointResolver
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(8)
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+def test_first_reachable_candidate_wins(listener):
+    resolver = EndpointResolver(gateway="192.0.2.1", connect_timeout=0.2)
+    url = f"http://gitea.invalid:{listener}/"
+    assert resolver.resolve(url, fallback_host="127.0.0.1") == f"http://127.0.0.1:{listener}"
+
+
+def test_winner_is_cached_until_invalidated(listener, monkeypatch):
+    resolver = EndpointResolver(connect_timeout=0.2)
+    calls = []
+    discover = resolver.discover
+    monkeypatch.setattr(resolver, "discover", lambda *a: calls.append(a) or discover(*a))
+    url = f"http://minio.invalid:{listener}"
+    resolved = resolver.resolve(url, fallback_host="127.0.0.1")
+    assert resolver.resolve(url, fallback_host="127.0.0.1") == resolved
+    assert len(calls) == 1
+
+    # Errors are reported against the resolved URL
+    resolver.invalidate(resolved + "/minio/health/ready")
+    resolver.resolve(url, fallback_host="127.0.0.1")
+    assert len(calls) == 2
+
+
+def test_unreachable_service_falls_back_without_caching():
+    resolver = EndpointResolver(connect_timeout=0.1)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    assert resolver.resolve(f"http://woodpecker.localhost:{port}", fallback_host="127.0.0.1") == f"http://127.0.0.1:{port}"
+    assert not resolver._cache
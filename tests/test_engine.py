@@ -0,0 +1,105 @@
+import io
+import json
+import os
+import socketserver
+import struct
+import tarfile
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from tests.engine import EngineClient, demux
+
+
+def frame(stream: int, payload: bytes) -> bytes:
+    return struct.pack(">BxxxI", stream, len(payload)) + payload
+
+
+class FakeEngine(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+    exec_delay = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.connections.add(id(self.connection))
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/v1.41/containers/k3d-gitopslab-server-0/json":
+            self.reply(200, json.dumps({"NetworkSettings": {"Networks": {"k3d": {"IPAddress": "10.89.0.2"}}}}).encode())
+        elif path == "/v1.41/networks/k3d":
+            self.reply(200, json.dumps({"IPAM": {"Config": [{"Subnet": "10.89.0.0/24", "Gateway": "10.89.0.1"}]}}).encode())
+        elif path == "/v1.41/exec/e1/json":
+            self.reply(200, json.dumps({"ExitCode": 3}).encode())
+        elif path == "/v1.41/containers/platform-bootstrap/archive":
+            buf = io.BytesIO()
+            with tarfile.open(fileobj=buf, mode="w") as tar:
+                info = tarfile.TarInfo(".gitea_token")
+                info.size = 5
+                tar.addfile(info, io.BytesIO(b"t0k3n"))
+            self.reply(200, buf.getvalue(), "application/x-tar")
+        else:
+            self.reply(404, json.dumps({"message": "no such container"}).encode())
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/v1.41/containers/platform-bootstrap/exec":
+            self.reply(201, json.dumps({"Id": "e1"}).encode())
+        elif self.path == "/v1.41/exec/e1/start":
+            # The engine answers only when the command exits
+            time.sleep(self.exec_delay)
+            self.reply(200, frame(1, b"out\n") + frame(2, b"err\n") + frame(1, b"more\n"),
+                       "application/vnd.docker.raw-stream")
+        else:
+            self.reply(404, b"{}")
+
+
+@pytest.fixture
+def engine():
+    path = os.path.join(tempfile.mkdtemp(), "engine.sock")
+    server = socketserver.ThreadingUnixStreamServer(path, FakeEngine)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakeEngine.connections.clear()
+    FakeEngine.exec_delay = 0.0
+    client = EngineClient(path, timeout=5)
+    yield client
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_queries_share_one_connection(engine):
+    assert engine.container_ip("k3d-gitopslab-server-0") == "10.89.0.2"
+    assert engine.network_gateways("k3d") == ["10.89.0.1"]
+    assert engine.inspect("missing") is None
+    assert engine.read_file("platform-bootstrap", "/workspace/.gitea_token") == b"t0k3n"
+    assert len(FakeEngine.connections) == 1
+
+
+def test_exec_demuxes_output_and_reports_exit_code(engine):
+    assert engine.exec("platform-bootstrap", ["sh", "-c", "false"]) == (3, "out\nmore\n", "err\n")
+
+
+def test_exec_outlives_the_client_timeout(engine):
+    engine.timeout = engine._conn.timeout = 0.2
+    FakeEngine.exec_delay = 0.5
+    assert engine.exec("platform-bootstrap", ["kubectl", "rollout", "status"]) == (3, "out\nmore\n", "err\n")
+    with pytest.raises(OSError):
+        engine.exec("platform-bootstrap", ["kubectl", "rollout", "status"], timeout=0.2)
+
+
+def test_demux_passes_tty_streams_through():
+    raw = b"plain tty output\n"
+    assert demux(raw) == (raw, b"")
+    assert demux(frame(1, b"a") + frame(2, b"b")) == (b"a", b"b")
@@ -0,0 +1,84 @@
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from tests.health_daemon import Check, HealthDaemon, query
+
+
+def counting_check(calls, name, ok=True, delay=0.0, warnings=()):
+    def run():
+        calls.append(name)
+        time.sleep(delay)
+        return ok, [] if ok else [f"{name} not accessible"], list(warnings)
+    return run
+
+
+@pytest.fixture
+def daemon():
+    instances = []
+
+    def make(checks):
+        d = HealthDaemon(checks)
+        instances.append(d)
+        return d
+    yield make
+    for d in instances:
+        d.stop()
+
+
+def test_checks_run_concurrently_on_their_own_schedule(daemon):
+    calls = []
+    d = daemon([
+        Check("gitea", counting_check(calls, "gitea", delay=0.2), interval=0.05),
+        Check("registry", counting_check(calls, "registry", delay=0.2), interval=0.05),
+        Check("oauth_config", counting_check(calls, "oauth_config"), interval=60),
+    ]).start()
+    time.sleep(0.5)
+    # Slow checks never overlap with themselves but run alongside each other
+    assert 2 <= calls.count("gitea") <= 3 and 2 <= calls.count("registry") <= 3
+    assert calls.count("oauth_config") == 1
+    assert d.snapshot()["status"] == "ok"
+
+
+def test_status_reflects_critical_and_warning_checks(daemon):
+    d = daemon([
+        Check("gitea", counting_check([], "gitea"), interval=60),
+        Check("woodpecker", counting_check([], "woodpecker", ok=False), interval=60, critical=False),
+        Check("argocd", counting_check([], "argocd", warnings=["3 pods"]), interval=60, critical=False),
+    ])
+    assert d.snapshot()["status"] == "degraded" and len(d.snapshot()["pending"]) == 3
+    d.run_now()
+    snapshot = d.snapshot()
+    assert snapshot["status"] == "degraded"
+    assert snapshot["checks"]["woodpecker"]["errors"] == ["woodpecker not accessible"]
+    assert snapshot["checks"]["argocd"]["warnings"] == ["3 pods"]
+
+    d.checks["gitea"].fn = counting_check([], "gitea", ok=False)
+    d.run_now(["gitea"])
+    assert d.snapshot()["status"] == "down"
+
+
+def test_http_endpoint_serves_cached_results(daemon):
+    calls = []
+    d = daemon([
+        Check("gitea", counting_check(calls, "gitea"), interval=60),
+        Check("registry", counting_check(calls, "registry", ok=False), interval=60),
+    ])
+    d.run_now()
+    port = d.serve(port=0).server_address[1]
+    base = f"http://127.0.0.1:{port}/health"
+
+    body = query(base)
+    assert body["status"] == "down" and set(body["checks"]) == {"gitea", "registry"}
+    assert query(f"{base}/gitea")["status"] == "ok"
+    assert sorted(calls) == ["gitea", "registry"]
+
+    assert query(f"{base}/gitea?refresh=1")["checks"]["gitea"]["age"] < 1
+    assert calls.count("gitea") == 2
+    with pytest.raises(urllib.error.HTTPError) as e:
+        urllib.request.urlopen(f"{base}/nope")
+    assert e.value.code == 404
+    assert query("http://127.0.0.1:9/health") is None
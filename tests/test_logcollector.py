@@ -0,0 +1,54 @@
+import json
+import os
+import time
+
+from tests import logcollector
+from tests.logcollector import LogBuffer, LogCollector, split_timestamp
+
+
+def test_buffer_is_bounded_and_sliced_by_time():
+    buf = LogBuffer(capacity=3)
+    for i in range(5):
+        buf.append(100.0 + i, "stdout", f"line {i}")
+    assert [e[2] for e in buf.tail(10)] == ["line 2", "line 3", "line 4"]
+    assert [e[2] for e in buf.slice(102.5, 103.5)] == ["line 3"]
+
+
+def test_follow_reconnects_without_duplicating_lines(monkeypatch):
+    monkeypatch.setattr(logcollector, "get_engine", lambda: None)
+    monkeypatch.setattr(logcollector, "RECONNECT_SEC", 0)
+    connections = iter([
+        ["2026-01-01T10:00:00.100000000Z starting", "2026-01-01T10:00:01.200000000Z restarting"],
+        # After a restart the engine replays from the (whole-second) `since`
+        ["2026-01-01T10:00:01.200000000Z restarting", "2026-01-01T10:00:02.000000000Z ready"],
+    ])
+    collector = LogCollector(["woodpecker-server"])
+
+    def stream(name, since):
+        lines = next(connections, None)
+        if lines is None:
+            collector._stop.set()
+            return
+        for line in lines:
+            yield "stdout", line
+
+    monkeypatch.setattr(collector, "_stream", stream)
+    collector._follow("woodpecker-server", time.time())
+    assert [e[2] for e in collector.buffers["woodpecker-server"].tail(10)] == ["starting", "restarting", "ready"]
+
+
+def test_bundle_holds_the_window_around_the_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr(logcollector, "get_engine", lambda: None)
+    collector = LogCollector(["gitea", "woodpecker-agent"])
+    start, _ = split_timestamp("2026-01-01T10:00:00Z", 0)
+    for offset, text in ((-60, "old"), (-5, "before"), (3, "during"), (40, "long after")):
+        collector.buffers["gitea"].append(start + offset, "stderr", text)
+
+    path = collector.write_bundle("tests/test_e2e_flow.py::test_pipeline_succeeded", start, start + 10,
+                                  margin=15, report="AssertionError", directory=str(tmp_path))
+    gitea_log = open(os.path.join(path, "gitea.log")).read()
+    assert "before" in gitea_log and "during" in gitea_log
+    assert "old" not in gitea_log and "long after" not in gitea_log
+    summary = json.load(open(os.path.join(path, "summary.json")))
+    assert summary["lines"] == {"gitea": 2, "woodpecker-agent": 0}
+    assert open(os.path.join(path, "failure.txt")).read() == "AssertionError"
@@ -0,0 +1,84 @@
+import os
+import pytest
+from tests.manifests import ManifestPatchError, main, patch_files, patch_manifest
+
+HELLO_DIR = os.path.join(os.path.dirname(__file__), "..", "gitops", "apps", "hello")
+
+
+def read(name):
+    with open(os.path.join(HELLO_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+WORKLOAD_WITH_INIT = """\
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: hello-api
+spec:
+  template:
+    spec:
+      initContainers:
+        - name: model-loader
+          image: minio/mc:latest  # pinned by ops
+      containers:
+        - name: hello-api
+          image: registry.localhost:5002/hello-api:dev
+"""
+
+
+def test_image_bump_only_touches_target_container():
+    original = read("deployment.yaml")
+    patched = patch_manifest(original, images={"hello-api": "registry.localhost:5002/hello-api:abc123"})
+
+    changed = [(a, b) for a, b in zip(original.splitlines(), patched.splitlines()) if a != b]
+    assert changed == [(
+        "          image: registry.localhost:5002/hello-api:dev",
+        "          image: registry.localhost:5002/hello-api:abc123",
+    )]
+
+
+def test_image_bump_leaves_init_containers_alone():
+    patched = patch_manifest(WORKLOAD_WITH_INIT, images={"hello-api": "hello-api:v2"})
+    assert "image: minio/mc:latest  # pinned by ops" in patched
+    assert "image: hello-api:v2" in patched
+
+
+def test_configmap_values_keep_string_type():
+    patched = patch_manifest(read("model-configmap.yaml"), config={"hello-api-model": {"MODEL_SHA": "1234", "MODEL_OBJECT": "ml-models/x.joblib"}})
+    assert '  MODEL_SHA: "1234"' in patched
+    assert "  MODEL_OBJECT: ml-models/x.joblib" in patched
+
+
+def test_missing_target_is_an_error():
+    with pytest.raises(ManifestPatchError):
+        patch_manifest(read("deployment.yaml"), images={"no-such-container": "x"})
+
+
+def test_patch_files_in_one_pass(tmp_path):
+    deploy = tmp_path / "deployment.yaml"
+    config = tmp_path / "model-configmap.yaml"
+    deploy.write_text(read("deployment.yaml"), encoding="utf-8")
+    config.write_text(read("model-configmap.yaml"), encoding="utf-8")
+
+    changed = patch_files(
+        [str(deploy), str(config)],
+        images={"hello-api": "hello-api:v2"},
+        config={"hello-api-model": {"MODEL_SHA": "abc"}},
+    )
+
+    assert sorted(changed) == sorted([str(deploy), str(config)])
+    assert "image: hello-api:v2" in deploy.read_text(encoding="utf-8")
+    assert "MODEL_SHA: abc" in config.read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("args, expected", [
+    (["--config", "badvalue"], "CONFIGMAP.KEY=VALUE"),
+    (["--config", "MODEL_SHA=abc"], "CONFIGMAP.KEY=VALUE"),
+    (["--image", "hello-api"], "CONTAINER=IMAGE"),
+])
+def test_cli_rejects_malformed_targets(args, expected, capsys):
+    with pytest.raises(SystemExit) as exc:
+        main(args + [os.path.join(HELLO_DIR, "deployment.yaml")])
+    assert exc.value.code == 2
+    assert expected in capsys.readouterr().err
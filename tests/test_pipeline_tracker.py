@@ -0,0 +1,90 @@
+import json
+import socket
+import threading
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tests.utils import PipelineTracker, iter_sse
+
+
+def pipeline(status, step_state, start=None, end=None):
+    step = {"id": 11, "name": "train-model", "state": step_state, "start_time": start, "end_time": end}
+    return {"number": 5, "status": status, "workflows": [{"name": "woodpecker", "children": [step]}]}
+
+
+def serve(events, stream=True):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == "/api/stream/events" and stream:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                self.wfile.write(b": ping\n\n")
+                for event in events:
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+            elif self.path == "/api/repos/1/pipelines/5":
+                body = json.dumps(events[-1]["pipeline"] if not stream else pipeline("pending", "pending")).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self.send_response(404)
+                self.end_headers()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+EVENTS = [
+    {"repo": {"id": 2}, "pipeline": pipeline("running", "running")},
+    {"repo": {"id": 1}, "pipeline": pipeline("running", "running", start=100)},
+    {"repo": {"id": 1}, "pipeline": pipeline("success", "success", start=100, end=142)},
+]
+
+
+def test_iter_sse_skips_comments_and_joins_data_lines():
+    lines = [b": ping\n", b"\n", b'data: {"a":\n', b"data: 1}\n", b"\n", b"data: not-json\n", b"\n"]
+    assert list(iter_sse(lines)) == [{"a": 1}]
+
+
+def test_tracker_follows_event_stream():
+    server = serve(EVENTS)
+    try:
+        tracker = PipelineTracker(f"http://127.0.0.1:{server.server_port}", 1, {}, 5, stream_logs=False)
+        result = tracker.wait(timeout=10)
+    finally:
+        server.shutdown()
+    assert result["status"] == "success"
+    assert tracker.steps["train-model"]["state"] == "success"
+    assert tracker.step_duration("train-model") == 42
+
+
+def test_tracker_falls_back_to_polling():
+    server = serve(EVENTS, stream=False)
+    try:
+        tracker = PipelineTracker(f"http://127.0.0.1:{server.server_port}", 1, {}, 5, stream_logs=False, poll_interval=0.1)
+        assert tracker.wait(timeout=10)["status"] == "success"
+    finally:
+        server.shutdown()
+
+
+def test_failed_resync_after_quiet_stream_switches_to_polling():
+    tracker = PipelineTracker("http://127.0.0.1:9", 1, {}, 5, stream_logs=False, poll_interval=0.01)
+    responses = iter([urllib.error.URLError("connection refused"), pipeline("success", "success", 100, 142)])
+
+    def open_stream(path):
+        raise socket.timeout("timed out")
+
+    def refresh():
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        tracker._apply(response)
+
+    tracker._open, tracker.refresh = open_stream, refresh
+    assert tracker.wait(timeout=5)["status"] == "success"
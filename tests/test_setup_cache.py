@@ -0,0 +1,40 @@
+import base64
+import json
+import time
+from tests.setup_cache import SetupCache, jwt_expiry
+
+
+def make_jwt(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).rstrip(b"=").decode()
+    return f"eyJhbGciOiJIUzI1NiJ9.{payload}.sig"
+
+
+def test_reuses_verified_entry_across_runs(tmp_path):
+    path = str(tmp_path / "cache.json")
+    calls = []
+    create = lambda: calls.append(1) or "token-1"
+
+    assert SetupCache("fp", path).ensure("pat", verify=lambda v: True, create=create) == "token-1"
+    assert SetupCache("fp", path).ensure("pat", verify=lambda v: v == "token-1", create=create) == "token-1"
+    assert len(calls) == 1
+
+
+def test_failed_verification_or_new_fingerprint_reprovisions(tmp_path):
+    path = str(tmp_path / "cache.json")
+    SetupCache("fp", path).put("repo", 7)
+
+    assert SetupCache("fp", path).ensure("repo", verify=lambda v: False, create=lambda: 8) == 8
+    assert SetupCache("other", path).get("repo") is None
+
+
+def test_expiring_tokens_are_not_reused(tmp_path):
+    path = str(tmp_path / "cache.json")
+    soon = make_jwt(int(time.time()) + 60)
+    later = make_jwt(int(time.time()) + 3600)
+    assert jwt_expiry(later) is not None
+
+    cache = SetupCache("fp", path)
+    cache.put("a", soon, jwt_expiry(soon))
+    cache.put("b", later, jwt_expiry(later))
+    assert cache.get("a") is None
+    assert cache.get("b") == later
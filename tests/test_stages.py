@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from tests.stages import Checkpoint, Stage, StageRunner
+
+
+def build(calls, valid=lambda name: True, fail=None):
+    def stage(name, out=None):
+        def fn(ctx):
+            calls.append(name)
+            if name == fail:
+                raise RuntimeError(f"{name} failed")
+            return out
+        return fn
+
+    def probe(name):
+        return lambda ctx, out: valid(name)
+
+    return [
+        Stage("ready", stage("ready")),
+        Stage("commit", stage("commit", {"commit_sha": "abc"}), verify=probe("commit")),
+        Stage("build", stage("build", {"image": "hello-api:abc"}), deps=["commit", "ready"], verify=probe("build")),
+        Stage("rollout", stage("rollout"), deps=["build"], verify=probe("rollout")),
+    ]
+
+
+def test_resume_skips_verified_stages_and_reruns_the_failed_one(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    calls = []
+    with pytest.raises(RuntimeError):
+        StageRunner(build(calls, fail="rollout"), checkpoint=Checkpoint(path)).run({})
+    assert sorted(calls) == ["build", "commit", "ready", "rollout"]
+    assert oct(os.stat(path).st_mode & 0o777) == "0o600"
+
+    calls.clear()
+    ctx = StageRunner(build(calls), checkpoint=Checkpoint(path), resume=True).run({})
+    assert sorted(calls) == ["ready", "rollout"]
+    assert ctx == {"commit_sha": "abc", "image": "hello-api:abc"}
+
+
+def test_failed_probe_reruns_the_stage_and_everything_downstream(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    StageRunner(build([]), checkpoint=Checkpoint(path)).run({})
+
+    calls = []
+    StageRunner(build(calls, valid=lambda name: name != "build"), checkpoint=Checkpoint(path), resume=True).run({})
+    assert sorted(calls) == ["build", "ready", "rollout"]
+
+
+def test_run_without_resume_starts_a_fresh_checkpoint(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    StageRunner(build([]), checkpoint=Checkpoint(path)).run({})
+    assert set(Checkpoint(path).stages) == {"ready", "commit", "build", "rollout"}
+    assert Checkpoint(path, env_fingerprint="other platform").stages == {}
+
+    calls = []
+    StageRunner(build(calls), checkpoint=Checkpoint(path)).run({})
+    assert sorted(calls) == ["build", "commit", "ready", "rollout"]
@@ -0,0 +1,90 @@
+import json
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from tests.tracing import Tracer
+from tests import e2e_impl, utils
+
+
+def test_spans_nest_per_thread_and_export_as_chrome_trace(tmp_path):
+    tracer = Tracer()
+    with tracer.span("rollout", "stage"):
+        with tracer.span("kubectl rollout", "k8s", command="kubectl rollout status") as sp:
+            sp.set(returncode=0)
+
+        def poll():
+            with tracer.span("GET /healthz", "http"):
+                pass
+        worker = threading.Thread(target=poll, name="stage-worker")
+        worker.start()
+        worker.join()
+
+    trace = json.loads(open(tracer.export(str(tmp_path / "run.trace.json"))).read())
+    spans = {e["name"]: e for e in trace["traceEvents"] if e["ph"] == "X"}
+    assert spans["kubectl rollout"]["args"] == {"command": "kubectl rollout status", "returncode": 0,
+                                                "outcome": "ok", "parent": "rollout"}
+    outer, inner = spans["rollout"], spans["kubectl rollout"]
+    assert outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    assert "parent" not in spans["rollout"]["args"] and "parent" not in spans["GET /healthz"]["args"]
+    threads = {e["args"]["name"] for e in trace["traceEvents"] if e["ph"] == "M"}
+    assert "stage-worker" in threads
+
+
+def test_failed_span_records_the_error():
+    tracer = Tracer()
+    with pytest.raises(ValueError):
+        with tracer.span("train", "stage"):
+            raise ValueError("model.sha missing")
+    assert tracer.spans[0].args == {"outcome": "error", "error": "ValueError: model.sha missing"}
+    assert tracer.summary()[0]["name"] == "train"
+
+
+def test_wait_for_http_records_attempts(monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(utils, "span", tracer.span)
+    results = iter([ConnectionError("refused"), ConnectionError("refused"), "ok"])
+
+    def check():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert utils.wait_for_http("MinIO", check, timeout=5, interval=0) == "ok"
+    assert tracer.spans[0].name == "wait MinIO"
+    assert tracer.spans[0].args["attempts"] == 3
+
+
+def test_command_spans_leave_arguments_out(monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(utils, "span", tracer.span)
+    utils.run_command([sys.executable, "-c", "pass", "alias", "set", "minio", "http://minio:9000", "admin", "s3cret"])
+    assert tracer.spans[0].args == {"returncode": 0, "outcome": "ok"}
+    assert "s3cret" not in json.dumps(tracer.to_chrome_trace())
+
+
+@pytest.mark.parametrize("module", [utils, e2e_impl], ids=["utils", "e2e_impl"])
+def test_kubectl_spans_keep_only_the_verb(module, monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(module, "span", tracer.span)
+    monkeypatch.setattr(module, "_invoke_kubectl", lambda command, *args: "configmap/hello created")
+    module.invoke_kubectl("kubectl -n apps create configmap hello --from-literal=token=s3cret")
+
+    def fail(command, *args):
+        raise subprocess.CalledProcessError(1, command)
+    monkeypatch.setattr(module, "_invoke_kubectl", fail)
+    with pytest.raises(subprocess.CalledProcessError):
+        module.invoke_kubectl("kubectl -n apps apply -f - <<'EOF'\npassword: s3cret\nEOF")
+
+    assert [(s.name, s.args.get("returncode")) for s in tracer.spans] == [("kubectl create", 0), ("kubectl apply", 1)]
+    assert "s3cret" not in json.dumps(tracer.to_chrome_trace())
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False)
+    with tracer.span("GET /", "http") as sp:
+        sp.set(status=200)
+    assert tracer.spans == []
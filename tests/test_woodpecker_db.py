@@ -0,0 +1,42 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from tests.woodpecker_db import upsert_woodpecker_user
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "woodpecker.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, forge_id INTEGER, forge_remote_id TEXT, login TEXT UNIQUE,"
+                 " access_token TEXT, admin BOOLEAN, hash TEXT)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_upsert_inserts_then_updates_only_on_change(db_path):
+    user, changed = upsert_woodpecker_user(db_path, "gitops", "1", "token-a", "hash-a")
+    assert changed and user == {"id": "1", "hash": "hash-a", "access_token": "token-a"}
+
+    assert upsert_woodpecker_user(db_path, "gitops", "1", "token-a", "hash-b") == (user, False)
+
+    user, changed = upsert_woodpecker_user(db_path, "gitops", "1", "token-b", "hash-b")
+    # The existing hash is kept: tokens already signed with it stay valid
+    assert changed and user == {"id": "1", "hash": "hash-a", "access_token": "token-b"}
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT count(*), forge_remote_id, admin FROM users").fetchone() == (1, "1", 1)
+    conn.close()
+
+
+def test_cli_reads_the_user_from_stdin(db_path):
+    script = os.path.join(os.path.dirname(__file__), "woodpecker_db.py")
+    spec = {"login": "gitops", "forge_remote_id": "1", "access_token": "s3cret", "hash": "h"}
+    res = subprocess.run([sys.executable, script, db_path], input=json.dumps(spec),
+                         capture_output=True, text=True, check=True)
+    assert json.loads(res.stdout) == {"user": {"id": "1", "hash": "h", "access_token": "s3cret"}, "changed": True}
@@ -0,0 +1,150 @@
+"""
+In-process span tracing for the e2e runner and the pytest suite.
+
+http_request, run_command, invoke_kubectl, wait_for_http, e2e stages and
+pytest tests each open a span; nesting follows the call stack through a
+ContextVar, so a kubectl exec inside a wait inside a stage shows up as such.
+export() writes Chrome trace-event JSON that chrome://tracing and
+https://ui.perfetto.dev open directly, no collector needed.
+
+Recording is always on (a span is one dict); set E2E_TRACE=off to disable.
+The e2e runner always writes traces/e2e-<time>.trace.json; pytest writes
+one only with E2E_TRACE=on (or E2E_TRACE=<path>).
+"""
+import contextvars
+import json
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TRACE_DIR = os.path.join(REPO_ROOT, "traces")
+# Keeps a runaway polling loop from growing the trace without bound
+MAX_SPANS = 200_000
+
+
+def describe_error(e: BaseException) -> str:
+    # A failed command's message repeats its full command line, secrets included
+    if isinstance(e, subprocess.CalledProcessError):
+        return f"CalledProcessError: exit status {e.returncode}"
+    if isinstance(e, subprocess.TimeoutExpired):
+        return f"TimeoutExpired: after {e.timeout}s"
+    return f"{type(e).__name__}: {e}"[:500]
+
+
+class Span:
+    __slots__ = ("id", "name", "category", "parent", "start", "_t0", "duration", "thread", "args")
+
+    def __init__(self, span_id: int, name: str, category: str, parent: Optional["Span"], args: Dict[str, Any]):
+        self.id = span_id
+        self.name = name
+        self.category = category
+        self.parent = parent
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.thread = threading.current_thread()
+        self.args = args
+
+    def set(self, **attrs: Any):
+        self.args.update(attrs)
+
+
+class _NullSpan:
+    def set(self, **attrs: Any):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+        # New threads start with an empty context, so pool workers open root spans on their own track
+        self._current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(f"span-{id(self)}", default=None)
+
+    @contextmanager
+    def span(self, name: str, category: str = "e2e", **args: Any) -> Iterator[Span]:
+        if not self.enabled:
+            yield NULL_SPAN
+            return
+        with self._lock:
+            self._next_id += 1
+            span_id = self._next_id
+        span = Span(span_id, name, category, self._current.get(), args)
+        token = self._current.set(span)
+        try:
+            yield span
+            span.args.setdefault("outcome", "ok")
+        except BaseException as e:
+            span.args["outcome"] = "error"
+            span.args["error"] = describe_error(e)
+            raise
+        finally:
+            span.duration = time.perf_counter() - span._t0
+            self._current.reset(token)
+            with self._lock:
+                if len(self.spans) < MAX_SPANS:
+                    self.spans.append(span)
+                else:
+                    self.dropped += 1
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        threads = {}
+        events = []
+        for s in sorted(spans, key=lambda s: s.start):
+            threads.setdefault(s.thread.ident, s.thread.name)
+            args = {k: v if isinstance(v, (str, int, float, bool, type(None))) else str(v) for k, v in s.args.items()}
+            if s.parent is not None:
+                args["parent"] = s.parent.name
+            events.append({
+                "name": s.name, "cat": s.category, "ph": "X", "pid": pid, "tid": s.thread.ident,
+                "ts": s.start * 1e6, "dur": (s.duration or 0.0) * 1e6, "args": args,
+            })
+        for tid, name in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"dropped_spans": self.dropped}}
+
+    def export(self, path: str) -> str:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
+        return path
+
+    def summary(self, top: int = 10) -> List[Dict[str, Any]]:
+        """Total time per (category, name), largest first."""
+        totals: Dict[tuple, List[float]] = {}
+        with self._lock:
+            for s in self.spans:
+                totals.setdefault((s.category, s.name), []).append(s.duration or 0.0)
+        rows = [{"category": c, "name": n, "count": len(d), "total": sum(d)} for (c, n), d in totals.items()]
+        return sorted(rows, key=lambda r: -r["total"])[:top]
+
+
+TRACER = Tracer(enabled=os.environ.get("E2E_TRACE", "").lower() not in ("off", "0", "false"))
+span = TRACER.span
+
+
+def default_trace_path(prefix: str) -> str:
+    return os.path.join(TRACE_DIR, f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}.trace.json")
+
+
+def configured_trace_path(prefix: str, default_on: bool) -> Optional[str]:
+    """Where E2E_TRACE says the trace should go, or None for no export."""
+    setting = os.environ.get("E2E_TRACE", "")
+    if setting.lower() in ("off", "0", "false"):
+        return None
+    if setting.lower() in ("on", "1", "true") or (not setting and default_on):
+        return default_trace_path(prefix)
+    return setting or None
@@ -7,11 +7,18 @@ import subprocess
 import base64
 import hashlib
 import hmac
+import urllib.parse
 import urllib.request
 import urllib.error
 import tempfile
 import re
-from typing import Dict, Optional, Any, Callable
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Callable
+
+from tests.engine import get_engine
+from tests.tracing import span
 
 # === Configuration ===
 
@@ -43,60 +50,191 @@ def http_request(url: str, method: str = "GET", headers: Dict = None, data: Any
         headers["Content-Type"] = "application/json"
 
     req = urllib.request.Request(url, method=method, data=data, headers=headers or {})
-    try:
-        with urllib.request.urlopen(req) as resp:
-            content = resp.read()
-            if resp.headers.get_content_type() == "application/json":
-                return json.loads(content)
-            return content
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode('utf-8', errors='ignore')
-        print(f"[HTTP] {method} {url} -> {e.code}: {error_body}")
-        raise
+    u = urllib.parse.urlparse(url)
+    with span(f"{method} {u.netloc}{u.path}", "http", url=url) as sp:
+        try:
+            with urllib.request.urlopen(req) as resp:
+                content = resp.read()
+                sp.set(status=resp.status, bytes=len(content))
+                if resp.headers.get_content_type() == "application/json":
+                    return json.loads(content)
+                return content
+        except urllib.error.HTTPError as e:
+            sp.set(status=e.code)
+            error_body = e.read().decode('utf-8', errors='ignore')
+            print(f"[HTTP] {method} {url} -> {e.code}: {error_body}")
+            raise
+        except urllib.error.URLError:
+            # Connection refused/timed out: rediscover the endpoint on the next resolve_url()
+            ENDPOINTS.invalidate(url)
+            raise
 
 def wait_for_http(name: str, check_fn: Callable[[], Any], timeout: int = 60, interval: int = 2):
     deadline = time.time() + timeout
     last_err = None
-    while time.time() < deadline:
-        try:
-            return check_fn()
-        except Exception as e:
-            last_err = e
-            time.sleep(interval)
-    raise TimeoutError(f"{name} not ready after {timeout}s. Last error: {last_err}")
+    with span(f"wait {name}", "wait", timeout=timeout) as sp:
+        attempts = 0
+        while time.time() < deadline:
+            attempts += 1
+            try:
+                result = check_fn()
+                sp.set(attempts=attempts)
+                return result
+            except Exception as e:
+                last_err = e
+                time.sleep(interval)
+        sp.set(attempts=attempts, last_error=str(last_err))
+        raise TimeoutError(f"{name} not ready after {timeout}s. Last error: {last_err}")
 
 # === Command Helpers ===
 
 def run_command(cmd: list, check: bool = True, capture_output: bool = True, timeout: int = None) -> subprocess.CompletedProcess:
     print(f"[CMD] {' '.join(cmd)}")
-    try:
-        return subprocess.run(cmd, check=check, capture_output=capture_output, text=True, timeout=timeout)
-    except subprocess.CalledProcessError as e:
-        print(f"[CMD] Failed: {e.cmd}")
-        print(f"[CMD] STDOUT: {e.stdout}")
-        print(f"[CMD] STDERR: {e.stderr}")
-        raise
+    # Only the program and subcommand: arguments carry secrets (mc alias set ... <password>)
+    with span(" ".join(cmd[:2]), "cmd") as sp:
+        try:
+            res = subprocess.run(cmd, check=check, capture_output=capture_output, text=True, timeout=timeout)
+            sp.set(returncode=res.returncode)
+            return res
+        except subprocess.CalledProcessError as e:
+            sp.set(returncode=e.returncode)
+            print(f"[CMD] Failed: {e.cmd}")
+            print(f"[CMD] STDOUT: {e.stdout}")
+            print(f"[CMD] STDERR: {e.stderr}")
+            raise
+
+# === Image Build Helpers ===
+
+def build_hello_api_image(tag: str, context: str, engine: str = "podman", python_image: str = "python:3.10-slim",
+                          run: Optional[Callable[..., subprocess.CompletedProcess]] = None,
+                          push_deps: Optional[bool] = None) -> Dict[str, Any]:
+    """Build hello-api on a dependency image keyed on requirements.txt.
+
+    Same scheme as scripts/build-hello-api.sh (which needs a POSIX shell): the
+    `<image>-deps:<hash>` image is reused if present locally or in the registry,
+    so code-only changes just rebuild the final COPY layer. A freshly built deps
+    image is pushed with `push_deps` (default: HELLO_API_DEPS_PUSH=1), so later
+    builds elsewhere can pull it. Returns the timings.
+    """
+    run = run or run_command
+    if push_deps is None:
+        push_deps = os.environ.get("HELLO_API_DEPS_PUSH", "0") == "1"
+    # The local registries are plain HTTP
+    tls = ["--tls-verify=false"] if os.path.basename(engine) == "podman" else []
+    with open(os.path.join(context, "requirements.txt"), "rb") as f:
+        req_hash = hashlib.sha256(python_image.encode() + b"\n" + f.read()).hexdigest()[:12]
+    deps_image = f"{tag.rsplit(':', 1)[0]}-deps:{req_hash}"
+    dockerfile = os.path.join(context, "Dockerfile")
+
+    start = time.time()
+    if run([engine, "image", "inspect", deps_image], check=False).returncode == 0:
+        deps_status = "cached"
+    elif run([engine, "pull", *tls, deps_image], check=False).returncode == 0:
+        deps_status = "pulled"
+    else:
+        run([engine, "build", "--target", "deps", "--build-arg", f"PYTHON_IMAGE={python_image}",
+             "-t", deps_image, "-f", dockerfile, context])
+        deps_status = "built"
+        if push_deps and run([engine, "push", *tls, deps_image], check=False).returncode != 0:
+            print(f"[build] WARN: could not push {deps_image}")
+    deps_done = time.time()
+
+    run([engine, "build", "--build-arg", f"PYTHON_IMAGE={python_image}", "--build-arg", f"DEPS_IMAGE={deps_image}",
+         "-t", tag, "-f", dockerfile, context])
+    app_done = time.time()
+
+    timings = {"deps_image": deps_image, "deps_status": deps_status,
+               "deps_sec": deps_done - start, "app_sec": app_done - deps_done, "total_sec": app_done - start}
+    print("[build] Build timing:")
+    print(f"[build]   deps  {deps_image}  {deps_status}  {timings['deps_sec']:.1f}s")
+    print(f"[build]   app   {tag}  built  {timings['app_sec']:.1f}s")
+    print(f"[build]   total {timings['total_sec']:.1f}s")
+    return timings
 
 # === URL Helpers ===
 
+# Connect timeout for each discovery candidate; a live local port answers in milliseconds
+CONNECT_TIMEOUT_SEC = 0.5
+
+class EndpointResolver:
+    """Per-session choice of the host that actually reaches each service.
+
+    `*.localhost` names resolve on most Linux hosts but not on Windows, and a
+    rootless engine may only expose ports on the podman gateway. Instead of a
+    blocking DNS lookup per call, the configured host, `localhost` and the
+    gateway are raced with short TCP connects; the first to accept wins and is
+    cached per (host, port) until a connection error invalidates it.
+    """
+
+    def __init__(self, gateway: Optional[str] = None, connect_timeout: float = CONNECT_TIMEOUT_SEC):
+        self.gateway = gateway
+        self.connect_timeout = connect_timeout
+        self._lock = threading.Lock()
+        # (configured host, port) -> winning host
+        self._cache: Dict[tuple, str] = {}
+
+    @staticmethod
+    def _key(url: str) -> tuple:
+        u = urllib.parse.urlparse(url)
+        return u.hostname, u.port or (443 if u.scheme == "https" else 80)
+
+    def candidates(self, host: str, fallback_host: str = "localhost") -> List[str]:
+        hosts = [host, fallback_host, self.gateway]
+        return [h for i, h in enumerate(hosts) if h and h not in hosts[:i]]
+
+    def _connect(self, host: str, port: int) -> str:
+        with socket.create_connection((host, port), timeout=self.connect_timeout):
+            return host
+
+    def discover(self, host: str, port: int, fallback_host: str = "localhost") -> Optional[str]:
+        hosts = self.candidates(host, fallback_host)
+        pool = ThreadPoolExecutor(max_workers=len(hosts))
+        futures = [pool.submit(self._connect, h, port) for h in hosts]
+        try:
+            for future in as_completed(futures, timeout=self.connect_timeout * 4):
+                if future.exception() is None:
+                    return future.result()
+        except FutureTimeoutError:
+            pass
+        finally:
+            # Losers (e.g. a hanging name lookup) finish in the background
+            pool.shutdown(wait=False)
+        return None
+
+    def resolve(self, url: str, fallback_host: str = "localhost") -> str:
+        u = urllib.parse.urlparse(url)
+        if not u.hostname:
+            return url.rstrip("/")
+        key = self._key(url)
+        with self._lock:
+            host = self._cache.get(key)
+        if host is None:
+            started = time.time()
+            host = self.discover(key[0], key[1], fallback_host)
+            if host is None:
+                # Nothing is listening yet (service still starting): keep the old behaviour, don't cache
+                host = fallback_host if u.hostname.endswith(".localhost") else u.hostname
+            else:
+                print(f"[endpoint] {u.hostname}:{key[1]} -> {host} ({(time.time() - started) * 1000:.0f}ms)")
+                with self._lock:
+                    self._cache[key] = host
+        return url.rstrip("/") if host == u.hostname else rewrite_url_host(url, host)
+
+    def invalidate(self, url: str):
+        """Forget the endpoint behind `url`, given either as configured or as resolved."""
+        host, port = self._key(url)
+        with self._lock:
+            for key, winner in list(self._cache.items()):
+                if key[1] == port and host in (key[0], winner):
+                    del self._cache[key]
+
+ENDPOINTS = EndpointResolver(gateway=ENV_VARS.get("PODMAN_GATEWAY", "10.88.0.1"))
+
 def resolve_url(url: str, fallback_host: str = "localhost") -> str:
-    from urllib.parse import urlparse
-    u = urlparse(url)
-    # On Windows, .localhost domains don't resolve, always use localhost
-    if u.hostname and u.hostname.endswith('.localhost'):
-        new_netloc = f"{fallback_host}:{u.port}" if u.port else fallback_host
-        return u._replace(netloc=new_netloc).geturl().rstrip("/")
-    try:
-        import socket
-        socket.gethostbyname(u.hostname)
-        return url.rstrip("/")
-    except:
-        new_netloc = f"{fallback_host}:{u.port}" if u.port else fallback_host
-        return u._replace(netloc=new_netloc).geturl().rstrip("/")
+    return ENDPOINTS.resolve(url, fallback_host)
 
 def rewrite_url_host(url: str, target_host: str) -> str:
-    from urllib.parse import urlparse
-    u = urlparse(url)
+    u = urllib.parse.urlparse(url)
     new_netloc = f"{target_host}:{u.port}" if u.port else target_host
     return u._replace(netloc=new_netloc).geturl().rstrip("/")
 
@@ -143,149 +281,346 @@ def generate_woodpecker_token(user_id: str, user_hash: str) -> str:
     signature = hmac.new(user_hash.encode("utf-8"), message.encode("utf-8"), hashlib.sha256).digest()
     return f"{message}.{b64url(signature)}"
 
-def perform_woodpecker_oauth_login(woodpecker_url: str, gitea_url: str, username: str, password: str) -> Optional[str]:
-    """Perform Woodpecker OAuth login via Playwright browser automation and create PAT.
-    
-    This logs into Woodpecker via Gitea OAuth, creates a Personal Access Token (PAT),
-    and returns the PAT for API authentication via x-api-key header.
-    Returns PAT string if successful, None otherwise.
+def gitea_get_files(gitea_url: str, owner: str, repo: str, paths: List[str], headers: Dict, ref: str = "main") -> Dict[str, Optional[Dict[str, str]]]:
+    """Fetch several files from the Gitea contents API in parallel.
+
+    Returns {path: {"sha": blob_sha, "content": text}}, with None for files that
+    do not exist yet.
+    """
+    def fetch(path: str) -> Optional[Dict[str, str]]:
+        try:
+            resp = http_request(f"{gitea_url}/api/v1/repos/{owner}/{repo}/contents/{path}?ref={ref}", headers=dict(headers))
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+        return {"sha": resp["sha"], "content": base64.b64decode(resp["content"]).decode("utf-8")}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(paths))) as pool:
+        return dict(zip(paths, pool.map(fetch, paths)))
+
+def gitea_commit_files(gitea_url: str, owner: str, repo: str, files: Dict[str, str], message: str, headers: Dict,
+                       branch: str = "main", current: Optional[Dict[str, Optional[Dict[str, str]]]] = None) -> str:
+    """Write several files as a single commit and return its SHA.
+
+    Uses Gitea's batch endpoint (POST /repos/{owner}/{repo}/contents), so one
+    push event reaches Woodpecker/Argo CD instead of one per file. `current` is
+    the result of gitea_get_files() when the caller already has it; otherwise
+    the blob SHAs are fetched here.
+    """
+    if current is None:
+        current = gitea_get_files(gitea_url, owner, repo, list(files), headers, ref=branch)
+
+    changes = []
+    for path, content in files.items():
+        existing = current.get(path)
+        change = {
+            "operation": "update" if existing else "create",
+            "path": path,
+            "content": base64.b64encode(content.encode("utf-8")).decode(),
+        }
+        if existing:
+            change["sha"] = existing["sha"]
+        changes.append(change)
+
+    resp = http_request(
+        f"{gitea_url}/api/v1/repos/{owner}/{repo}/contents",
+        method="POST",
+        headers=dict(headers),
+        json_data={"branch": branch, "message": message, "files": changes},
+    )
+    return resp["commit"]["sha"]
+
+def woodpecker_repo_ready(woodpecker_url: str, repo_id: int, headers: Dict) -> bool:
+    """Single GET proving the token is valid and the repo is active and fully trusted."""
+    repo = http_request(f"{woodpecker_url}/api/repos/{repo_id}", headers=dict(headers))
+    trusted = repo.get("trusted")
+    trusted_ok = all(trusted.values()) if isinstance(trusted, dict) else bool(trusted)
+    return bool(repo.get("active", True)) and trusted_ok
+
+# Cookies for Gitea and Woodpecker saved by Playwright; holds sessions, so it is gitignored
+BROWSER_STATE_PATH = os.path.join(get_repo_root(), ".e2e-browser-state.json")
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+JWT_PATTERN = r"eyJ[A-Za-z0-9_-]+\.eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+"
+
+def perform_woodpecker_oauth_login(woodpecker_url: str, gitea_url: str, username: str, password: str,
+                                   state_path: Optional[str] = None, timeout_ms: int = 30000) -> Optional[str]:
+    """Read the Woodpecker Personal Access Token (PAT) from the CLI & API page via Playwright.
+
+    The browser storage state is saved to `state_path` (E2E_BROWSER_STATE, default
+    .e2e-browser-state.json) and loaded on the next run, so a live session goes
+    straight to the token; the Gitea OAuth login only runs when it has expired.
+    Images, fonts and media are not loaded. Returns the PAT, or None on failure.
     """
     try:
         from playwright.sync_api import sync_playwright
     except ImportError:
         print("[OAuth] Playwright not installed. Run: pip install playwright && python -m playwright install chromium")
         return None
-    
-    print(f"[OAuth] Starting browser automation for {woodpecker_url}")
-    pat_token = None
-    
+
+    state_path = state_path or os.environ.get("E2E_BROWSER_STATE", BROWSER_STATE_PATH)
+    # The OAuth callback lands on WOODPECKER_HOST (woodpecker.localhost), so the session cookie lives there
+    base_url = woodpecker_url.rstrip("/")
+    if urllib.parse.urlparse(base_url).hostname in ("localhost", "127.0.0.1"):
+        base_url = rewrite_url_host(base_url, "woodpecker.localhost")
+    cli_api_url = f"{base_url}/user/cli-and-api"
+    started = time.time()
+    print(f"[OAuth] Starting browser automation for {base_url}")
+
     try:
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=True)
-            context = browser.new_context()
-            page = context.new_page()
-            
-            # Navigate to Woodpecker
-            # Use 127.0.0.1 instead of localhost to avoid Windows IPv6 issues
-            if "localhost" in woodpecker_url:
-                woodpecker_url = woodpecker_url.replace("localhost", "127.0.0.1")
-            
-            print(f"[OAuth] Navigating to {woodpecker_url}")
-            page.goto(woodpecker_url, timeout=60000)
-            page.wait_for_load_state("networkidle")
-            
-            # Check if we're on login page or already logged in
-            if "login" in page.url.lower():
-                # Find and click login button
+            try:
+                reuse = os.path.isfile(state_path)
+                context = browser.new_context(storage_state=state_path if reuse else None)
+                context.route("**/*", lambda route: route.abort()
+                              if route.request.resource_type in BLOCKED_RESOURCE_TYPES else route.continue_())
+                page = context.new_page()
+                page.set_default_timeout(timeout_ms)
+
+                token_el = page.locator(f"text=/{JWT_PATTERN}/").first
+                login_btn = page.locator("text=Login with gitea").or_(page.locator("button:has-text('gitea')")).first
+
+                page.goto(cli_api_url, wait_until="domcontentloaded")
+                token_el.or_(login_btn).first.wait_for()
+
+                if not token_el.is_visible():
+                    print(f"[OAuth] {'Saved session expired' if reuse else 'No saved session'}, logging in via Gitea")
+                    login_btn.click()
+                    page.wait_for_url(lambda url: not (url.startswith(base_url) and "login" in url), wait_until="commit")
+                    if not page.url.startswith(base_url):
+                        if "/user/login" in page.url:
+                            page.fill("#user_name", username)
+                            page.fill("#password", password)
+                            page.click("button[type='submit'], .ui.primary.button")
+                            page.wait_for_url(lambda url: "/user/login" not in url, wait_until="commit")
+                        page.wait_for_load_state("domcontentloaded")
+                        # Gitea redirects straight back for an already granted app, otherwise shows the grant page
+                        if "authorize" in page.url and not page.url.startswith(base_url):
+                            page.click("button:has-text('Authorize'), button:has-text('Grant')")
+                        page.wait_for_url(lambda url: url.startswith(base_url), wait_until="commit")
+                    page.goto(cli_api_url, wait_until="domcontentloaded")
+                    token_el.wait_for()
+
+                match = re.search(JWT_PATTERN, token_el.inner_text())
+                pat_token = match.group(0) if match else None
+                if pat_token:
+                    context.storage_state(path=state_path)
+                    os.chmod(state_path, 0o600)
+                    print(f"[OAuth] Found PAT token: {pat_token[:30]}... ({time.time() - started:.1f}s)")
+                return pat_token
+            finally:
+                browser.close()
+
+    except Exception as e:
+        print(f"[OAuth] Error during browser automation after {time.time() - started:.1f}s: {e}")
+        return None
+
+# === Woodpecker Pipeline Tracking ===
+
+WOODPECKER_DONE_STATES = {"success", "failure", "killed", "error", "declined", "skipped"}
+
+def iter_sse(lines: Iterable[bytes]) -> Iterator[Any]:
+    """Yield JSON payloads of a server-sent event stream; comments/heartbeats and non-JSON data are skipped."""
+    data = []
+    for raw in lines:
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if line.startswith("data:"):
+            data.append(line[5:].lstrip())
+        elif not line and data:
+            try:
+                yield json.loads("\n".join(data))
+            except ValueError:
+                pass
+            data = []
+
+def woodpecker_trigger_pipeline(woodpecker_url: str, repo_id: int, headers: Dict, branch: str = "main") -> Dict[str, Any]:
+    """Start a manual pipeline; Woodpecker answers with the created pipeline, number included."""
+    return http_request(f"{woodpecker_url}/api/repos/{repo_id}/pipelines", method="POST", headers=dict(headers), json_data={"branch": branch})
+
+class PipelineTracker:
+    """Follow one Woodpecker pipeline over /api/stream/events until it finishes.
+
+    Step state changes are printed as they happen and, with `stream_logs`, each
+    step's log is streamed from /api/stream/logs in a background thread. If the
+    event stream is unavailable it falls back to polling the pipeline.
+    """
+
+    def __init__(self, woodpecker_url: str, repo_id: int, headers: Dict, number: int,
+                 stream_logs: bool = True, poll_interval: float = 3.0, read_timeout: float = 30.0):
+        self.woodpecker_url = woodpecker_url.rstrip("/")
+        self.repo_id = repo_id
+        self.headers = dict(headers)
+        self.number = number
+        self.stream_logs = stream_logs
+        self.poll_interval = poll_interval
+        self.read_timeout = read_timeout
+        self.pipeline: Dict[str, Any] = {}
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self._log_threads: Dict[int, threading.Thread] = {}
+
+    @property
+    def status(self) -> Optional[str]:
+        return self.pipeline.get("status")
+
+    @property
+    def done(self) -> bool:
+        return self.status in WOODPECKER_DONE_STATES
+
+    def _open(self, path: str):
+        req = urllib.request.Request(f"{self.woodpecker_url}{path}", headers={**self.headers, "Accept": "text/event-stream"})
+        return urllib.request.urlopen(req, timeout=self.read_timeout)
+
+    def refresh(self):
+        self._apply(http_request(f"{self.woodpecker_url}/api/repos/{self.repo_id}/pipelines/{self.number}", headers=dict(self.headers)))
+
+    def _apply(self, pipeline: Dict[str, Any]):
+        if pipeline.get("status") != self.pipeline.get("status"):
+            print(f"[wp] pipeline #{self.number}: {pipeline.get('status')}")
+        self.pipeline = pipeline
+        for workflow in pipeline.get("workflows") or []:
+            for step in workflow.get("children") or []:
+                name = step.get("name", "?")
+                prev = self.steps.get(name, {}).get("state")
+                state = step.get("state")
+                self.steps[name] = {
+                    "id": step.get("id"),
+                    "state": state,
+                    "started": step.get("start_time") or step.get("started"),
+                    "finished": step.get("end_time") or step.get("finished"),
+                }
+                if state == prev:
+                    continue
+                duration = self.step_duration(name)
+                print(f"[wp] step {name}: {state}" + (f" ({duration:.0f}s)" if duration is not None and state in WOODPECKER_DONE_STATES else ""))
+                if self.stream_logs and state == "running" and step.get("id"):
+                    self._follow_logs(name, step["id"])
+
+    def step_duration(self, name: str) -> Optional[float]:
+        step = self.steps.get(name) or {}
+        if step.get("started") and step.get("finished"):
+            return float(step["finished"] - step["started"])
+        return None
+
+    def _follow_logs(self, name: str, step_id: int):
+        if step_id in self._log_threads:
+            return
+
+        def follow():
+            try:
+                with self._open(f"/api/stream/logs/{self.repo_id}/{self.number}/{step_id}") as resp:
+                    for entry in iter_sse(resp):
+                        data = entry.get("data") or ""
+                        try:
+                            # Log lines are []byte in the API, i.e. base64 in JSON
+                            text = base64.b64decode(data).decode("utf-8", errors="replace")
+                        except ValueError:
+                            text = str(data)
+                        print(f"[wp:{name}] {text.rstrip()}")
+            except Exception as e:
+                print(f"[wp:{name}] log stream closed: {e}")
+
+        thread = threading.Thread(target=follow, name=f"wp-log-{name}", daemon=True)
+        self._log_threads[step_id] = thread
+        thread.start()
+
+    def wait(self, timeout: float = 900) -> Dict[str, Any]:
+        """Block until the pipeline finishes; returns the final pipeline object."""
+        deadline = time.time() + timeout
+        streaming = True
+        while not self.done and time.time() < deadline:
+            if streaming:
                 try:
-                    login_btn = page.locator("text=Login with gitea").first
-                    if login_btn.is_visible():
-                        print("[OAuth] Clicking 'Login with gitea' button")
-                        login_btn.click()
-                        page.wait_for_load_state("networkidle")
-                except:
-                    pass
-                
-                # Handle Gitea login page
-                if "login" in page.url.lower():
-                    print(f"[OAuth] On Gitea login page: {page.url}")
+                    with self._open("/api/stream/events") as resp:
+                        # Catch up after subscribing, so no transition between trigger and connect is lost
+                        self.refresh()
+                        for event in iter_sse(resp):
+                            pipeline, repo = event.get("pipeline") or {}, event.get("repo") or {}
+                            if repo.get("id") == self.repo_id and pipeline.get("number") == self.number:
+                                self._apply(pipeline)
+                            if self.done or time.time() >= deadline:
+                                break
+                    if not self.done:
+                        # Server closed the stream; don't spin if it keeps doing so
+                        time.sleep(1)
+                except (TimeoutError, socket.timeout):
+                    # Quiet stream: re-sync and resubscribe
                     try:
-                        page.fill("#user_name", username)
-                        page.fill("#password", password)
-                        page.click("button[type='submit'], .ui.primary.button")
-                        page.wait_for_load_state("networkidle")
-                        print("[OAuth] Credentials submitted")
+                        self.refresh()
                     except Exception as e:
-                        print(f"[OAuth] Login form error: {e}")
-                
-                # Handle OAuth authorization page
-                if "authorize" in page.url.lower():
-                    print("[OAuth] On OAuth authorization page")
-                    try:
-                        page.click("button:has-text('Authorize'), button:has-text('Grant')")
-                        page.wait_for_load_state("networkidle")
-                    except:
-                        pass
-                
-                page.wait_for_timeout(2000)
-            
-            # Now we should be logged in - navigate to CLI & API page to get PAT
-            # Use woodpecker.localhost for proper session handling
-            base_url = woodpecker_url.replace("localhost:8000", "woodpecker.localhost:8000").replace("127.0.0.1:8000", "woodpecker.localhost:8000")
-            cli_api_url = f"{base_url}/user/cli-and-api"
-            print(f"[OAuth] Navigating to CLI & API page: {cli_api_url}")
-            page.goto(cli_api_url, timeout=60000)
-            page.wait_for_load_state("networkidle")
-            page.wait_for_timeout(2000)
-            
-            # Check if we need to re-login (session issues)
-            if "login" in page.url.lower():
-                print("[OAuth] Session lost, re-logging in...")
+                        print(f"[wp] re-sync failed ({e}), polling every {self.poll_interval:.0f}s")
+                        streaming = False
+                except (urllib.error.URLError, ConnectionError, OSError) as e:
+                    print(f"[wp] event stream unavailable ({e}), polling every {self.poll_interval:.0f}s")
+                    streaming = False
+            else:
                 try:
-                    page.click("button:has-text('gitea')")
-                    page.wait_for_load_state("networkidle")
-                    page.wait_for_timeout(1000)
-                except:
-                    pass
-                # Navigate again
-                page.goto(cli_api_url, timeout=30000)
-                page.wait_for_load_state("networkidle")
-                page.wait_for_timeout(1000)
-            
-            # Look for the Personal Access Token on the page
-            # Token is a JWT starting with "eyJ"
-            try:
-                # Get all text content and find JWT tokens
-                page_content = page.content()
-                import re as regex
-                jwt_pattern = r'(eyJ[A-Za-z0-9_-]+\.eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+)'
-                jwt_matches = regex.findall(jwt_pattern, page_content)
-                
-                if jwt_matches:
-                    pat_token = jwt_matches[0]
-                    print(f"[OAuth] Found PAT token: {pat_token[:30]}...")
-                else:
-                    # Try looking in specific elements
-                    token_elements = page.locator("code, pre, input[readonly], .token-value, span").all()
-                    for el in token_elements:
-                        try:
-                            text = el.text_content() or el.get_attribute("value") or ""
-                            if text.startswith("eyJ") and len(text) > 50:
-                                pat_token = text.strip()
-                                print(f"[OAuth] Found PAT in element: {pat_token[:30]}...")
-                                break
-                        except:
-                            continue
-                            
-            except Exception as e:
-                print(f"[OAuth] Error extracting PAT: {e}")
-            
-            # Check if we're on repos page (logged in successfully)
-            success = "/repos" in page.url or "/user" in page.url
-            print(f"[OAuth] Final URL: {page.url}, Success: {success}")
-            
-            browser.close()
-            return pat_token
-            
-    except Exception as e:
-        print(f"[OAuth] Error during browser automation: {e}")
-        return None
+                    self.refresh()
+                except Exception as e:
+                    print(f"[wp] poll failed: {e}")
+                if not self.done:
+                    time.sleep(self.poll_interval)
+        if not self.done:
+            raise TimeoutError(f"Pipeline #{self.number} still {self.status} after {timeout}s")
+        for thread in self._log_threads.values():
+            thread.join(timeout=5)
+        self.print_summary()
+        return self.pipeline
+
+    def print_summary(self):
+        print(f"[wp] pipeline #{self.number} {self.status}")
+        for name, step in self.steps.items():
+            duration = self.step_duration(name)
+            print(f"[wp]   {name:<24} {step['state'] or '':<10} {'' if duration is None else f'{duration:.0f}s'}")
 
 # === K8s Helpers ===
 
 def get_server_endpoint(cluster: str) -> Dict[str, Any]:
-    cmd = ["podman", "inspect", "-f", "{{range .NetworkSettings.Networks}}{{.IPAddress}}{{end}}", f"k3d-{cluster}-server-0"]
-    res = run_command(cmd, check=False)
-    ip = res.stdout.strip()
+    name = f"k3d-{cluster}-server-0"
+    engine = get_engine()
+    if engine:
+        ip = engine.container_ip(name)
+    else:
+        cmd = ["podman", "inspect", "-f", "{{range .NetworkSettings.Networks}}{{.IPAddress}}{{end}}", name]
+        ip = run_command(cmd, check=False).stdout.strip()
     return {"ip": ip, "port": 6443, "cluster": cluster}
 
+def kubectl_verb(command: str) -> str:
+    """`kubectl -n apps rollout status ...` -> `kubectl rollout`, for span names."""
+    words = command.split()
+    for prev, word in zip(words, words[1:]):
+        if not word.startswith("-") and prev not in ("-n", "--namespace", "--context", "--kubeconfig"):
+            return f"kubectl {word}"
+    return "kubectl"
+
 def invoke_kubectl(command: str, cluster: str = "gitopslab") -> str:
+    # Only the verb: the command line may carry inline YAML or values
+    with span(kubectl_verb(command), "k8s") as sp:
+        try:
+            out = _invoke_kubectl(command, cluster)
+        except subprocess.CalledProcessError as e:
+            sp.set(returncode=e.returncode)
+            raise
+        sp.set(returncode=0)
+        return out
+
+def _invoke_kubectl(command: str, cluster: str) -> str:
     # Try using platform-bootstrap container if available as it has the environment setup
-    res = subprocess.run(["podman", "ps", "-q", "-f", "name=platform-bootstrap"], capture_output=True, text=True)
-    if res.stdout.strip():
-        exec_cmd = ["podman", "exec", "platform-bootstrap", "sh", "-c", command]
-        res_exec = run_command(exec_cmd, check=True)
-        return res_exec.stdout
+    engine = get_engine()
+    if engine:
+        if engine.containers(name="platform-bootstrap"):
+            print(f"[exec] platform-bootstrap: {command}")
+            code, out, err = engine.exec("platform-bootstrap", ["sh", "-c", command])
+            if code != 0:
+                print(f"[exec] Failed ({code}): {err}")
+                raise subprocess.CalledProcessError(code, command, out, err)
+            return out
+    else:
+        res = subprocess.run(["podman", "ps", "-q", "-f", "name=platform-bootstrap"], capture_output=True, text=True)
+        if res.stdout.strip():
+            exec_cmd = ["podman", "exec", "platform-bootstrap", "sh", "-c", command]
+            res_exec = run_command(exec_cmd, check=True)
+            return res_exec.stdout
 
     # Fallback to ephemeral container
     server = get_server_endpoint(cluster)
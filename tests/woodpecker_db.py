@@ -0,0 +1,50 @@
+"""
+Direct access to the Woodpecker SQLite database.
+
+Only depends on the standard library so it can also be executed inside a
+throwaway python container when the volume mountpoint is not readable from the
+host. The user is read as JSON from stdin, so the access token never appears
+on a command line:
+
+    echo '{"login": "gitops", "forge_remote_id": "1", "access_token": "...", "hash": "..."}' \
+        | python woodpecker_db.py /data/woodpecker.sqlite
+"""
+import json
+import sqlite3
+import sys
+from typing import Dict, Tuple
+
+
+def upsert_woodpecker_user(db_path: str, login: str, forge_remote_id: str, access_token: str, user_hash: str) -> Tuple[Dict[str, str], bool]:
+    """Make sure `login` exists with `access_token`, in a single transaction.
+
+    Returns the user row and whether anything was written, so callers only
+    restart woodpecker-server when its cached user actually changed.
+    """
+    conn = sqlite3.connect(db_path, timeout=10)
+    try:
+        with conn:
+            row = conn.execute("SELECT id, hash, access_token FROM users WHERE login = ? LIMIT 1", (login,)).fetchone()
+            changed = False
+            if row is None:
+                conn.execute(
+                    "INSERT INTO users (forge_id, forge_remote_id, login, access_token, admin, hash) VALUES (1, ?, ?, ?, 1, ?)",
+                    (str(forge_remote_id), login, access_token, user_hash),
+                )
+                changed = True
+            elif row[2] != access_token:
+                conn.execute("UPDATE users SET access_token = ? WHERE id = ?", (access_token, row[0]))
+                changed = True
+            if changed:
+                row = conn.execute("SELECT id, hash, access_token FROM users WHERE login = ? LIMIT 1", (login,)).fetchone()
+    finally:
+        conn.close()
+    return {"id": str(row[0]), "hash": row[1], "access_token": row[2]}, changed
+
+
+if __name__ == "__main__":
+    spec = json.load(sys.stdin)
+    user, changed = upsert_woodpecker_user(
+        sys.argv[1], spec["login"], spec["forge_remote_id"], spec["access_token"], spec["hash"],
+    )
+    print(json.dumps({"user": user, "changed": changed}))